@@ -10,6 +10,8 @@ from dotenv import load_dotenv
 from pinecone import Pinecone
 from huggingface_hub import InferenceClient
 import traceback
+import threading
+import time
 
 load_dotenv()
 
@@ -22,17 +24,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-API_KEY = os.environ["PINECONE_API_KEY"]
+API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = "aptos-whitepaper"
 USER_IDS_FILE = "user_snippet_ids.json"
-HF_TOKEN = os.environ["HF_TOKEN"]
+HF_TOKEN = os.getenv("HF_TOKEN")
 MODEL_NAME = "BAAI/bge-base-en-v1.5"
+INIT_ATTEMPTS = int(os.getenv("INIT_ATTEMPTS", "3"))
+INIT_RETRY_DELAY = float(os.getenv("INIT_RETRY_DELAY", "0.5"))
 
-pc = Pinecone(api_key=API_KEY)
-desc = pc.describe_index(INDEX_NAME)
-index = pc.Index(host=desc.host)
+# Pinecone and the inference client are created on first use (or by the
+# startup warmup), so importing the app never blocks on the network and a
+# briefly unavailable upstream is retried instead of crashing the worker.
+_index = None
+_client = None
+_init_lock = threading.Lock()
+started_at = time.monotonic()
 
-client = InferenceClient(provider="hf-inference", api_key=HF_TOKEN)
+def with_retries(name, fn, attempts=INIT_ATTEMPTS, delay=INIT_RETRY_DELAY):
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            print(f"{name} init failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+def get_index():
+    global _index
+    if _index is None:
+        with _init_lock:
+            if _index is None:
+                if not API_KEY:
+                    raise RuntimeError("PINECONE_API_KEY is not set")
+                pc = Pinecone(api_key=API_KEY)
+                desc = with_retries("Pinecone", lambda: pc.describe_index(INDEX_NAME))
+                _index = pc.Index(host=desc.host)
+    return _index
+
+def get_client():
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                if not HF_TOKEN:
+                    raise RuntimeError("HF_TOKEN is not set")
+                _client = InferenceClient(provider="hf-inference", api_key=HF_TOKEN)
+    return _client
+
+def warmup():
+    # Keep trying in the background until the index is reachable; /ready reports progress
+    while True:
+        try:
+            get_client()
+            get_index().describe_index_stats()
+            print("RAG warmup complete")
+            return
+        except Exception as e:
+            print(f"RAG warmup failed, retrying: {e}")
+            time.sleep(5)
+
+@app.on_event("startup")
+async def startup_event():
+    threading.Thread(target=warmup, name="rag-warmup", daemon=True).start()
+
+@app.get("/health")
+def liveness():
+    return {"status": "ok", "uptime_seconds": round(time.monotonic() - started_at, 1)}
+
+@app.get("/ready")
+def readiness():
+    ready = _index is not None and _client is not None
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "index": _index is not None, "inference": _client is not None})
 
 # Helper to store user snippet IDs for listing/deletion
 if not os.path.exists(USER_IDS_FILE):
@@ -235,12 +299,12 @@ def serve_ui():
 @app.post("/add_snippet")
 def add_snippet(req: AddSnippetRequest):
     try:
-        embedding = client.feature_extraction(req.text, model=MODEL_NAME)
+        embedding = get_client().feature_extraction(req.text, model=MODEL_NAME)
         if hasattr(embedding, "tolist"):
             embedding = embedding.tolist()
         snippet_id = f"user-{uuid.uuid4()}"
         now = datetime.utcnow().isoformat()
-        index.upsert(vectors=[(
+        get_index().upsert(vectors=[(
             snippet_id,
             embedding,
             {"text": req.text, "section": req.section, "date": now}
@@ -255,11 +319,11 @@ def add_snippet(req: AddSnippetRequest):
 @app.post("/edit_snippet")
 def edit_snippet(req: EditSnippetRequest):
     try:
-        embedding = client.feature_extraction(req.text, model=MODEL_NAME)
+        embedding = get_client().feature_extraction(req.text, model=MODEL_NAME)
         if hasattr(embedding, "tolist"):
             embedding = embedding.tolist()
         now = datetime.utcnow().isoformat()
-        index.upsert(vectors=[(req.id, embedding, {"text": req.text, "section": req.section, "date": now})])
+        get_index().upsert(vectors=[(req.id, embedding, {"text": req.text, "section": req.section, "date": now})])
         return {"status": "success", "id": req.id}
     except Exception as e:
         print("Error in /edit_snippet endpoint:", e)
@@ -269,7 +333,7 @@ def edit_snippet(req: EditSnippetRequest):
 @app.post("/delete_snippet")
 def delete_snippet(req: DeleteSnippetRequest):
     try:
-        index.delete(ids=[req.id])
+        get_index().delete(ids=[req.id])
         remove_user_id(req.id)
         return {"status": "deleted", "id": req.id}
     except Exception as e:
@@ -281,7 +345,7 @@ def list_snippets():
         ids = get_user_ids()
         if not ids:
             return {"snippets": []}
-        res = index.fetch(ids=ids)
+        res = get_index().fetch(ids=ids)
         snippets = []
         for id in ids:
             v = res.vectors.get(id)
@@ -297,7 +361,7 @@ def download_snippets():
         ids = get_user_ids()
         if not ids:
             return JSONResponse(content=json.dumps([]), media_type="application/json")
-        res = index.fetch(ids=ids)
+        res = get_index().fetch(ids=ids)
         snippets = []
         for id in ids:
             v = res.vectors.get(id)
@@ -308,7 +372,7 @@ def download_snippets():
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
 def get_embedding(text: str):
-    return client.feature_extraction(text, model=MODEL_NAME)
+    return get_client().feature_extraction(text, model=MODEL_NAME)
 
 @app.post("/query")
 def query_rag(req: QueryRequest):
@@ -316,7 +380,7 @@ def query_rag(req: QueryRequest):
         embedding = get_embedding(req.question)
         if hasattr(embedding, "tolist"):
             embedding = embedding.tolist()
-        results = index.query(vector=embedding, top_k=req.top_k, include_metadata=True)
+        results = get_index().query(vector=embedding, top_k=req.top_k, include_metadata=True)
         matches = [
             {
                 "score": match.score,
@@ -0,0 +1,115 @@
+"""Local stand-ins for Gemini and the RAG server with configurable latency.
+
+Serves the Gemini REST routes the google-genai SDK calls and the RAG server's
+/query on a single port, so the backend can be benchmarked fully offline:
+
+    python -m bench.fake_upstreams --port 9100 --gemini-latency-ms 300 --rag-latency-ms 120
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI()
+config = {"gemini_latency": 0.3, "gemini_jitter": 0.1, "rag_latency": 0.12, "rag_jitter": 0.04, "stream_chunks": 8}
+rng = random.Random(0)
+
+CHAT_REPLY = (
+    "Prompt.fun lets you launch and trade meme tokens on Aptos by typing what you want. "
+    "Ask me about bonding curves, XP or how to launch your first token."
+)
+
+async def delay(latency: float, jitter: float):
+    await asyncio.sleep(max(0.0, rng.uniform(latency - jitter, latency + jitter)))
+
+def prompt_text(body: dict) -> str:
+    return "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+def fake_intent(prompt: str) -> dict:
+    text = prompt.lower()
+    for verb in ("buy", "sell", "launch"):
+        if verb in text:
+            return {"intent": verb, "entities": {"token": "DOGE"}}
+    return {"intent": "ask" if "?" in text else "chat", "entities": {}}
+
+def reply_for(prompt: str) -> str:
+    if "numbered prompts" in prompt:
+        count = int(re.search(r"There are (\d+)", prompt).group(1))
+        lines = re.findall(r"^\d+\. (.*)$", prompt, re.MULTILINE)[-count:]
+        return json.dumps([fake_intent(json.loads(line)) for line in lines])
+    if "intent extraction agent" in prompt:
+        return json.dumps(fake_intent(prompt.rsplit("\n\n", 1)[-1]))
+    if "running summary" in prompt:
+        return "The user asked about Prompt.fun and token launches."
+    return CHAT_REPLY
+
+def gemini_response(text: str) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+    }
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/{version}/models/{model}")
+async def get_model(version: str, model: str):
+    # Used by GeminiService.warmup
+    return {"name": f"models/{model}", "displayName": model, "supportedGenerationMethods": ["generateContent"]}
+
+@app.post("/{version}/models/{model}:generateContent")
+async def generate_content(version: str, model: str, request: Request):
+    body = await request.json()
+    await delay(config["gemini_latency"], config["gemini_jitter"])
+    return JSONResponse(gemini_response(reply_for(prompt_text(body))))
+
+@app.post("/{version}/models/{model}:streamGenerateContent")
+async def stream_generate_content(version: str, model: str, request: Request):
+    body = await request.json()
+    text = reply_for(prompt_text(body))
+    chunks = config["stream_chunks"]
+    size = max(1, len(text) // chunks + 1)
+
+    async def events():
+        # Time to first token is a third of the full latency; the rest is spread over chunks
+        await delay(config["gemini_latency"] / 3, config["gemini_jitter"] / 3)
+        for i in range(0, len(text), size):
+            yield f"data: {json.dumps(gemini_response(text[i:i + size]))}\r\n\r\n"
+            await asyncio.sleep(config["gemini_latency"] * 2 / 3 / chunks)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/query")
+async def query(request: Request):
+    body = await request.json()
+    await delay(config["rag_latency"], config["rag_jitter"])
+    results = [
+        {"score": 0.9 - i * 0.1, "section": "Whitepaper", "text": f"Aptos answer #{i + 1} for: {body.get('question', '')}"}
+        for i in range(body.get("top_k", 1))
+    ]
+    return {"results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--rag-latency-ms", type=float, default=120)
+    parser.add_argument("--rag-jitter-ms", type=float, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config.update(
+        gemini_latency=args.gemini_latency_ms / 1000, gemini_jitter=args.gemini_jitter_ms / 1000,
+        rag_latency=args.rag_latency_ms / 1000, rag_jitter=args.rag_jitter_ms / 1000,
+    )
+    rng.seed(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark: local intent rules on typical /chat prompts.
+
+    python -m bench.intent_rules --repeat 20000
+
+Checks every prompt in CASES against the result the fast path must give
+(None: left to Gemini), then prints per-prompt microseconds for classify()
+and the local hit rate as JSON.
+"""
+import argparse
+import json
+import sys
+import time
+from services.intent_rules import IntentClassifier
+
+# prompt -> (intent, entities) resolved locally, or None for Gemini
+CASES = {
+    "buy 10 DOGE": ("buy", {"token": "DOGE", "amount": 10}),
+    "Sell 1.5k $PEPE": ("sell", {"token": "PEPE", "amount": 1500}),
+    "buy 1,000 DOGE": ("buy", {"token": "DOGE", "amount": 1000}),
+    "sell 2,500,000 PEPE": ("sell", {"token": "PEPE", "amount": 2500000}),
+    "buy DOGE with 1,000 apt": ("buy", {"token": "DOGE", "amount": 1000, "currency": "APT"}),
+    "buy 10 APT of DOGE": ("buy", {"token": "DOGE", "amount": 10, "currency": "APT"}),
+    "launch token ROCKET with supply 1m": ("launch", {"token": "ROCKET", "supply": 1000000}),
+    "buy 1,5 DOGE": None,
+    "buy 0 DOGE": None,
+    "buy 10 APT": None,
+    "create account": None,
+    "What is Prompt.fun?": None,
+}
+
+def check(classifier: IntentClassifier):
+    for prompt, expected in CASES.items():
+        result = classifier.classify(prompt)
+        got = None if result is None else (result["intent"], result["entities"])
+        if got != expected:
+            sys.exit(f"{prompt!r}: expected {expected}, got {got}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    classifier = IntentClassifier()
+    check(classifier)
+    classifier = IntentClassifier()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for prompt in CASES:
+            classifier.classify(prompt)
+    per_prompt_us = (time.perf_counter() - start) / (args.repeat * len(CASES)) * 1e6
+    print(json.dumps({"per_prompt_us": round(per_prompt_us, 3), "hit_rate": classifier.stats()["hit_rate"]}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Repeatable load test for the backend against fake Gemini/RAG upstreams.
+
+Starts bench.fake_upstreams and bench.serve_backend as subprocesses, drives
+each endpoint at a fixed request rate (open loop: requests are fired on
+schedule whether or not earlier ones have finished, so queueing shows up in
+the tail) and prints latency percentiles and throughput per endpoint as JSON.
+
+    python -m bench.run_bench --rps 50 --duration 20 --out bench.json
+    python -m bench.run_bench --endpoints chat,parse --gemini-latency-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_PROMPTS = [
+    "What is Prompt.fun?",
+    "How does the bonding curve work?",
+    # {n} varies the amount so these stay commands the local intent rules resolve
+    "Buy {n} DOGE",
+    "Sell {n} PEPE",
+    "Launch a token called MOON with supply {n}m",
+    "hello there",
+    "How do I earn XP?",
+]
+USER_SECTIONS = ["profile", "achievements", "quests", "activity"]
+
+def make_requests(endpoint: str, rng: random.Random, unique: int, addresses: list):
+    """Return a callable producing (method, path, json_body) for the endpoint."""
+    def variant(text):
+        # Vary a bounded number of prompts so caches see a realistic hit rate
+        n = rng.randrange(unique)
+        if "{n}" in text:
+            return text.format(n=n + 1)
+        return text if n == 0 else f"{text} #{n}"
+
+    if endpoint == "chat":
+        return lambda: ("POST", "/chat", {"message": variant(rng.choice(CHAT_PROMPTS)), "history": []})
+    if endpoint == "parse":
+        return lambda: ("POST", "/parse", {"prompt": variant(rng.choice(CHAT_PROMPTS))})
+    if endpoint == "ask":
+        return lambda: ("POST", "/ask", {"question": variant(rng.choice(CHAT_PROMPTS[:2] + CHAT_PROMPTS[-1:]))})
+    if endpoint.startswith("user/"):
+        section = endpoint.split("/", 1)[1]
+        return lambda: ("GET", f"/user/{section}?address={rng.choice(addresses)}", None)
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: list, statuses: dict, sent: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ok = statuses.get("2xx", 0)
+    return {
+        "sent": sent,
+        "ok": ok,
+        "errors": sent - ok,
+        "status": statuses,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+async def run_phase(client: httpx.AsyncClient, next_request, rps: float, duration: float, timeout: float) -> dict:
+    latencies = []
+    statuses = {}
+
+    async def fire():
+        method, path, body = next_request()
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, timeout=timeout)
+            key = f"{response.status_code // 100}xx"
+        except httpx.TimeoutException:
+            key = "timeout"
+        except httpx.HTTPError:
+            key = "connection_error"
+        latency = time.perf_counter() - start
+        statuses[key] = statuses.get(key, 0) + 1
+        if key == "2xx":
+            latencies.append(latency)
+
+    total = int(rps * duration)
+    tasks = []
+    start = time.perf_counter()
+    for i in range(total):
+        # Fixed schedule: request i goes out at i / rps regardless of responses
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire()))
+    await asyncio.gather(*tasks)
+    return summarize(latencies, statuses, total, time.perf_counter() - start)
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url, timeout=1.0)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+def spawn(module: str, args: list, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, *args], cwd=BACKEND_DIR, env=env)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def bench(args) -> dict:
+    rng = random.Random(args.seed)
+    addresses = [f"0x{rng.getrandbits(64):016x}" for _ in range(args.addresses)]
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=args.backend_url,
+        limits=httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections),
+    ) as client:
+        for endpoint in args.endpoints:
+            next_request = make_requests(endpoint, rng, args.unique_prompts, addresses)
+            # Short unmeasured warmup so connection setup and first-hit work are excluded
+            if args.warmup > 0:
+                await run_phase(client, next_request, args.rps, args.warmup, args.timeout)
+            results[endpoint] = await run_phase(client, next_request, args.rps, args.duration, args.timeout)
+            print(f"{endpoint}: {json.dumps(results[endpoint]['latency_ms'])}", file=sys.stderr)
+        stats = (await client.get("/stats")).json()
+    return {"endpoints": results, "server_stats": stats}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="chat,parse,ask," + ",".join(f"user/{s}" for s in USER_SECTIONS),
+                        help="comma-separated: chat, parse, ask, user/profile, user/achievements, user/quests, user/activity")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds per endpoint")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--unique-prompts", type=int, default=50, help="distinct variants per prompt template")
+    parser.add_argument("--addresses", type=int, default=100, help="wallet addresses used for /user/*")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--rag-latency-ms", type=float, default=120)
+    parser.add_argument("--rag-jitter-ms", type=float, default=40)
+    parser.add_argument("--mongo", default="memory", help="'memory' (mongomock-motor) or a MongoDB URI")
+    parser.add_argument("--backend-port", type=int, default=9000)
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("--backend-url", help="benchmark an already running backend instead of spawning one")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+
+    processes = []
+    try:
+        if not args.backend_url:
+            upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+            # All load comes from one IP, so the per-caller rate limiter would measure itself
+            env = dict(os.environ, GOOGLE_API_KEY="fake", GEMINI_BASE_URL=upstream_url, RAG_SERVER_URL=upstream_url,
+                       RATE_LIMIT_ENABLED="false")
+            processes.append(spawn("bench.fake_upstreams", [
+                "--port", str(args.upstream_port), "--seed", str(args.seed),
+                "--gemini-latency-ms", str(args.gemini_latency_ms), "--gemini-jitter-ms", str(args.gemini_jitter_ms),
+                "--rag-latency-ms", str(args.rag_latency_ms), "--rag-jitter-ms", str(args.rag_jitter_ms),
+            ], env))
+            processes.append(spawn("bench.serve_backend", ["--port", str(args.backend_port), "--mongo", args.mongo], env))
+            args.backend_url = f"http://127.0.0.1:{args.backend_port}"
+            asyncio.run(wait_ready(f"{upstream_url}/health"))
+        asyncio.run(wait_ready(f"{args.backend_url}/health/ready"))
+        report = asyncio.run(bench(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    report["config"] = {
+        key: getattr(args, key) for key in (
+            "rps", "duration", "warmup", "unique_prompts", "addresses", "seed", "mongo",
+            "gemini_latency_ms", "gemini_jitter_ms", "rag_latency_ms", "rag_jitter_ms",
+        )
+    }
+    report["commit"] = git_commit()
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
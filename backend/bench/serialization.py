@@ -0,0 +1,79 @@
+"""Micro-benchmark: default vs fast JSON path for the /user/* list responses.
+
+    python -m bench.serialization --sizes 5,20,100 --repeat 2000
+
+"default" is what a route did before FAST_JSON: build pydantic models from
+service dicts, let response_model validate them again, then jsonable_encoder
+plus the stdlib encoder. "fast" builds the slotted types and encodes them
+with services.fast_json (orjson when installed). Prints per-response
+microseconds and the speedup as JSON.
+"""
+import argparse
+import datetime
+import json
+import sys
+import time
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from models.prompt_models import Achievement, Activity, Quest
+from models.fast_models import FastAchievement, FastActivity, FastQuest
+from services import fast_json
+from services.achievement_service import ACHIEVEMENT_RULES
+from services.user_templates import QUEST_TEMPLATES
+
+def sample_rows(kind: str, size: int) -> list:
+    now = datetime.datetime.utcnow()
+    if kind == "activity":
+        return [
+            {"action": "Bought", "token": f"$T{i}", "amount": f"{i} APT", "time": f"{i} minutes ago", "type": "buy",
+             "ts": now - datetime.timedelta(minutes=i)}
+            for i in range(size)
+        ]
+    if kind == "achievements":
+        rules = [{**r, "unlocked": i % 2 == 0} for i, r in enumerate(ACHIEVEMENT_RULES)]
+        return [rules[i % len(rules)] for i in range(size)]
+    quests = [{**q, "progress": 1, "timeLeft": "5h"} for q in QUEST_TEMPLATES]
+    return [quests[i % len(quests)] for i in range(size)]
+
+TYPES = {"activity": (Activity, FastActivity), "achievements": (Achievement, FastAchievement), "quests": (Quest, FastQuest)}
+
+def default_path(model, adapter, rows) -> bytes:
+    models = [model(**r) for r in rows]
+    validated = adapter.validate_python(models, from_attributes=True)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+def fast_path(fast_type, rows) -> bytes:
+    return fast_json.dumps([fast_type.from_dict(r) for r in rows])
+
+def timed(fn, repeat: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5,20,100", help="list lengths to measure")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    results = {}
+    for kind, (model, fast_type) in TYPES.items():
+        adapter = TypeAdapter(List[model])
+        for size in [int(s) for s in args.sizes.split(",")]:
+            rows = sample_rows(kind, size)
+            if json.loads(default_path(model, adapter, rows)) != json.loads(fast_path(fast_type, rows)):
+                sys.exit(f"{kind}: fast path output differs from the default path")
+            default_us = timed(lambda: default_path(model, adapter, rows), args.repeat)
+            fast_us = timed(lambda: fast_path(fast_type, rows), args.repeat)
+            results[f"{kind}[{size}]"] = {
+                "default_us": round(default_us, 2),
+                "fast_us": round(fast_us, 2),
+                "speedup": round(default_us / fast_us, 2),
+            }
+    print(json.dumps({"encoder": "orjson" if fast_json.orjson else "json", "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
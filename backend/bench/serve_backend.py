@@ -0,0 +1,28 @@
+"""Run main:app for benchmarking, optionally against an in-memory MongoDB.
+
+    python -m bench.serve_backend --port 9000 --mongo memory
+
+`--mongo memory` needs `pip install mongomock-motor`; any other value is used
+as MONGO_URI. Upstream URLs come from the environment (see bench.run_bench).
+"""
+import argparse
+import os
+import uvicorn
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--mongo", default="memory")
+    args = parser.parse_args()
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        import services.mongo_service
+        services.mongo_service.AsyncIOMotorClient = lambda *a, **kw: AsyncMongoMockClient()
+    else:
+        os.environ["MONGO_URI"] = args.mongo
+    import main as backend
+    uvicorn.run(backend.app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,41 @@
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 import os
+import asyncio
+import json
+from contextlib import aclosing
+from bson import ObjectId
 from models.prompt_models import (
     PromptRequest, PromptResponse, RagQuestionRequest, RagAnswerResponse,
+    BatchPromptRequest, BatchPromptResult, BatchPromptResponse,
     ChatRequest, ChatResponse, ChatMessage, ActionResponse,
-    UserProfile, Achievement, Quest, Activity, UserXPRequest
+    UserProfile, Achievement, Quest, Activity, UserXPRequest, ActivityRequest, ShareRequest,
+    LaunchTokenRequest, TradeRequest, UserDashboard, DashboardRequest,
+    LeaderboardEntry, LeaderboardResponse
 )
 from services.gemini_service import GeminiService
 from services.rag_service import RagService
-from pymongo import MongoClient
+from services.mongo_service import MongoService
+from services.achievement_service import AchievementService, evaluate, rule_value
+from services.user_templates import merge_activity
+from services.quest_service import QuestService
+from services.ingest_service import IngestService, format_quantity
+from services.leaderboard_service import LeaderboardService, LEADERBOARD_METRICS
+from services.session_service import SessionService, InMemorySessionStore, MongoSessionStore
+from services.executor import UpstreamOverloaded
+from services.resilience import UpstreamTimeout
+from services.rate_limiter import RateLimiter, RateLimited, InMemoryBucketStore, MongoBucketStore
+from services.cache import UserResponseCache
+from services.warmup import Warmup
+from services.fast_json import FastJSONResponse, dumps as fast_dumps
+from models.fast_models import FastUserProfile, FastAchievement, FastQuest, FastActivity
+from services.metrics import REGISTRY, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, HTTP_ERRORS, render_stats
 import datetime
+import math
+import time
 from typing import List, Optional
 
 # Load environment variables
@@ -26,122 +51,496 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB client
-mongodb_client = None
-mongo_db = None
+# Network-dependent startup steps, retried in the background (see /health/ready)
+warmup = Warmup(
+    base_delay=float(os.getenv("WARMUP_RETRY_DELAY", "0.5")),
+    max_delay=float(os.getenv("WARMUP_RETRY_MAX_DELAY", "30")),
+)
+
+# MongoDB access layer (async, created at startup)
+mongo_service = None
+achievement_service = None
+quest_service = None
+leaderboard_service = None
+session_service = None
+ingest_service = None
+rate_limiter = None
 
 gemini_service = GeminiService()
 rag_service = RagService()
+# Rendered GET /user/* bodies per address; every write for an address bumps it
+user_response_cache = UserResponseCache(
+    max_bytes=int(os.getenv("USER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Latency is measured to the start of the response (first byte for streams)
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception as e:
+        HTTP_ERRORS.inc(route=route_label(request), error=type(e).__name__)
+        raise
+    finally:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, method=request.method, route=route_label(request), status=status
+        )
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+
+def route_label(request: Request) -> str:
+    # The route template keeps label cardinality bounded (no raw paths)
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(UpstreamTimeout)
+async def upstream_timeout_handler(request: Request, exc: UpstreamTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 @app.on_event("startup")
 async def startup_event():
-    global mongodb_client, mongo_db
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-    mongodb_client = MongoClient(mongo_uri)
-    mongo_db = mongodb_client[os.getenv("MONGO_DB", "promptfun")]  # default db name
-    print("Connected to MongoDB")
+    global mongo_service, achievement_service, quest_service, leaderboard_service, session_service, ingest_service, rate_limiter
+    # Nothing here touches the network; connections are made by the warmup
+    # steps below, which retry in the background while /health/ready is 503.
+    mongo_service = MongoService()
+    achievement_service = AchievementService(mongo_service, on_write=user_response_cache.bump)
+    quest_service = QuestService(mongo_service)
+    leaderboard_service = LeaderboardService(mongo_service)
+    if os.getenv("CHAT_SESSION_STORE", "memory") == "mongo":
+        session_store = MongoSessionStore(mongo_service, ttl_seconds=int(os.getenv("CHAT_SESSION_TTL", str(7 * 24 * 3600))))
+    else:
+        session_store = InMemorySessionStore(maxsize=int(os.getenv("CHAT_SESSION_MAX", "10000")))
+    session_service = SessionService(
+        session_store,
+        gemini_service,
+        token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000")),
+        compact_min_messages=int(os.getenv("CHAT_COMPACT_MIN_MESSAGES", "6")),
+    )
+    ingest_service = IngestService(
+        mongo_service,
+        leaderboard_service,
+        new_user,
+        max_batch=int(os.getenv("INGEST_MAX_BATCH", "500")),
+        flush_interval=float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0")),
+        max_pending=int(os.getenv("INGEST_MAX_PENDING", "20000")),
+        max_retry_delay=float(os.getenv("INGEST_MAX_RETRY_DELAY", "30")),
+        on_write=user_response_cache.bump,
+    )
+    ingest_service.start()
+    # "mongo" shares buckets across workers; "memory" limits each worker separately
+    if os.getenv("RATE_LIMIT_STORE", "memory") == "mongo":
+        rate_limit_store = MongoBucketStore(mongo_service)
+    else:
+        rate_limit_store = InMemoryBucketStore(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    rate_limiter = RateLimiter.from_env(rate_limit_store)
+
+    async def connect_mongo():
+        await mongo_service.ensure_indexes()
+        print("Connected to MongoDB")
+
+    warmup.add("mongo", connect_mongo)
+    warmup.add("leaderboard", leaderboard_service.rebuild)
+    warmup.add("chat_sessions", session_store.ensure_indexes)
+    warmup.add("rate_limits", rate_limit_store.ensure_indexes)
+    # Upstream pools are pre-opened when possible; requests still work without it
+    warmup.add("gemini", gemini_service.warmup, required=False)
+    warmup.add("rag", rag_service.warmup, required=False)
+    warmup.start()
+    if os.getenv("WARMUP_BLOCKING", "false").lower() in {"1", "true", "yes", "on"}:
+        await warmup.wait()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global mongodb_client
-    if mongodb_client:
-        mongodb_client.close()
+    await warmup.stop()
+    await rag_service.close()
+    gemini_service.executor.shutdown()
+    if ingest_service:
+        # Flush accepted trade events before the Mongo client goes away
+        await ingest_service.drain()
+    if mongo_service:
+        mongo_service.close()
         print("MongoDB connection closed")
 
+@app.get("/health/live")
+async def liveness():
+    # The event loop is answering; restarts should key off this, not upstreams
+    return {"status": "ok", "uptime_seconds": round(time.monotonic() - warmup.started_at, 1)}
+
+@app.get("/health/ready")
+async def readiness():
+    # 503 until MongoDB is reachable and in-memory state has been primed
+    return JSONResponse(status_code=200 if warmup.ready() else 503, content=warmup.stats())
+
+# --- Admission control for the LLM/RAG-backed routes ---
+# Every request is charged to the client IP's bucket. When the frontend sends
+# an X-Wallet-Address header it is also charged to that wallet's bucket; the
+# header is not authenticated, so it can only tighten the limit, never lift it.
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() in {"1", "true", "yes", "on"}
+
+def caller_keys(request: Request) -> list:
+    # The IP bucket is always charged, so rotating the header buys nothing
+    forwarded = request.headers.get("x-forwarded-for") if TRUST_PROXY_HEADERS else None
+    if forwarded:
+        keys = [f"ip:{forwarded.split(',')[0].strip()}"]
+    else:
+        keys = [f"ip:{request.client.host if request.client else 'unknown'}"]
+    wallet = request.headers.get("x-wallet-address", "").strip().lower()
+    if wallet:
+        keys.append(f"wallet:{wallet}")
+    return keys
+
+async def admit(request: Request, route_class: str, cost: float = 1):
+    # Raises RateLimited (429 with Retry-After) when any of the caller's buckets is empty
+    if rate_limiter is not None:
+        await rate_limiter.check(route_class, caller_keys(request), cost)
+
 @app.post("/parse", response_model=PromptResponse)
-async def parse_prompt(prompt: PromptRequest):
+async def parse_prompt(prompt: PromptRequest, request: Request):
+    await admit(request, "parse")
     try:
         result = await gemini_service.extract_intent(prompt.prompt)
         return PromptResponse(intent=result.get("intent", "unknown"), entities=result.get("entities", {}), raw=result)
+    except (UpstreamOverloaded, UpstreamTimeout):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini error: {e}")
 
+PARSE_BATCH_MAX = int(os.getenv("PARSE_BATCH_MAX", "1000"))
+
+@app.post("/parse/batch", response_model=BatchPromptResponse)
+async def parse_prompts_batch(req: BatchPromptRequest, request: Request):
+    if len(req.prompts) > PARSE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {PARSE_BATCH_MAX} prompts per batch")
+    # Charged per Gemini request the batch can need, not per prompt
+    await admit(request, "parse", math.ceil(len(req.prompts) / gemini_service.batch_pack_size))
+    results = []
+    for i, result in enumerate(await gemini_service.extract_intents(req.prompts)):
+        if isinstance(result, Exception):
+            results.append(BatchPromptResult(index=i, error=f"Gemini error: {result}"))
+        else:
+            raw = {k: v for k, v in result.items() if k != "raw_gemini"}
+            results.append(BatchPromptResult(
+                index=i, intent=result.get("intent", "unknown"), entities=result.get("entities", {}),
+                raw=raw, error=result.get("error"),
+            ))
+    return BatchPromptResponse(results=results)
+
 @app.post("/ask", response_model=RagAnswerResponse)
-async def ask_copilot(question: RagQuestionRequest):
+async def ask_copilot(question: RagQuestionRequest, request: Request):
+    await admit(request, "ask")
     try:
         result = await rag_service.ask(question.question)
         return RagAnswerResponse(answer=result.get("answer", "No answer found."), raw=result)
+    except (UpstreamOverloaded, UpstreamTimeout):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RAG error: {e}")
 
+# Speculative /chat: start the RAG lookup (and optionally the generic Gemini
+# reply) while the intent is still being extracted, keep the branch the intent
+# selects and cancel the rest. Each speculative call costs one unit of budget.
+CHAT_SPECULATION_BUDGET = int(os.getenv("CHAT_SPECULATION_BUDGET", "0"))
+CHAT_SPECULATE_GEMINI = os.getenv("CHAT_SPECULATE_GEMINI", "false").lower() in {"1", "true", "yes", "on"}
+speculation_stats = {"started": 0, "used": 0, "cancelled": 0}
+
+def start_speculation(req: ChatRequest, history: list) -> dict:
+    budget = CHAT_SPECULATION_BUDGET
+    if req.speculation_budget is not None:
+        budget = min(budget, req.speculation_budget)
+    # Commands the local fast path resolves never need either branch
+    if budget <= 0 or gemini_service.fast_path.resolves(req.message):
+        return {}
+    tasks = {"ask": asyncio.create_task(rag_service.ask(req.message))}
+    if CHAT_SPECULATE_GEMINI and budget >= 2:
+        tasks["chat"] = asyncio.create_task(gemini_service.chat(history, req.message))
+    speculation_stats["started"] += len(tasks)
+    return tasks
+
+async def take_speculation(tasks: dict, name: str, fallback):
+    task = tasks.pop(name, None)
+    if task is None:
+        return await fallback()
+    speculation_stats["used"] += 1
+    return await task
+
+async def cancel_speculation(tasks: dict):
+    for task in tasks.values():
+        task.cancel()
+    speculation_stats["cancelled"] += len(tasks)
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+async def load_chat_history(req: ChatRequest):
+    # -> (history to prompt with, session or None). With a session the client
+    # sends only the new message; the server supplies summary + recent window.
+    if req.session_id:
+        session = await session_service.load(req.session_id)
+        return session_service.prompt_history(session), session
+    return [msg.dict() for msg in req.history], None
+
+async def record_chat_turn(session, user_message: str, assistant_reply: str, background_tasks: BackgroundTasks):
+    if await session_service.record_turn(session, user_message, assistant_reply):
+        background_tasks.add_task(session_service.compact, session["id"])
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(req: ChatRequest):
-    intent_result = await gemini_service.extract_intent(req.message)
-    intent = intent_result.get("intent", "unknown")
-    entities = intent_result.get("entities", {})
-    history = [msg.dict() for msg in req.history]
+async def chat_endpoint(req: ChatRequest, request: Request, background_tasks: BackgroundTasks):
+    await admit(request, "chat")
+    history, session = await load_chat_history(req)
+    user_message = req.message
+    speculative = start_speculation(req, history)
+    try:
+        intent_result = await gemini_service.extract_intent(user_message)
+        intent = intent_result.get("intent", "unknown")
+        entities = intent_result.get("entities", {})
+        action = None
+        if intent == "ask":
+            rag_result = await take_speculation(speculative, "ask", lambda: rag_service.ask(user_message))
+            assistant_reply = rag_result.get("answer", "No answer found.")
+        elif intent in {"buy", "sell", "launch"}:
+            assistant_reply = f"Okay, running {intent} for {entities.get('token', '')}..."
+            action = ActionResponse(type=intent, params=entities)
+        else:
+            assistant_reply = await take_speculation(speculative, "chat", lambda: gemini_service.chat(history, user_message))
+    finally:
+        await cancel_speculation(speculative)
+    if session is not None:
+        await record_chat_turn(session, user_message, assistant_reply, background_tasks)
+        return ChatResponse(response=assistant_reply, action=action, session_id=session["id"])
+    updated_history = history + [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": assistant_reply},
+    ]
+    return ChatResponse(response=assistant_reply, history=updated_history, action=action)
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest, request: Request, background_tasks: BackgroundTasks):
+    # Checked before the stream starts so a rejection is a plain 429
+    await admit(request, "chat")
+    # Server-Sent Events: "intent" first, then "token" chunks, then "done"
+    # with the updated history (or "error"). Headers go out immediately so the
+    # client sees the intent as soon as it is known.
     user_message = req.message
-    updated_history = history + [{"role": "user", "content": user_message}]
-    action = None
-    if intent == "ask":
-        rag_result = await rag_service.ask(user_message)
-        assistant_reply = rag_result.get("answer", "No answer found.")
-        updated_history.append({"role": "assistant", "content": assistant_reply})
-        return ChatResponse(response=assistant_reply, history=updated_history, action=None)
-    elif intent in {"buy", "sell", "launch"}:
-        assistant_reply = f"Okay, running {intent} for {entities.get('token', '')}..."
-        action = ActionResponse(type=intent, params=entities)
-        updated_history.append({"role": "assistant", "content": assistant_reply})
-        return ChatResponse(response=assistant_reply, history=updated_history, action=action)
+
+    async def events():
+        try:
+            history, session = await load_chat_history(req)
+            intent_result = await gemini_service.extract_intent(user_message)
+            intent = intent_result.get("intent", "unknown")
+            entities = intent_result.get("entities", {})
+            action = None
+            if intent in {"buy", "sell", "launch"}:
+                action = ActionResponse(type=intent, params=entities).dict()
+            yield sse_event("intent", {"intent": intent, "entities": entities, "action": action})
+            if intent == "ask":
+                rag_result = await rag_service.ask(user_message)
+                assistant_reply = rag_result.get("answer", "No answer found.")
+                yield sse_event("token", {"text": assistant_reply})
+            elif action is not None:
+                assistant_reply = f"Okay, running {intent} for {entities.get('token', '')}..."
+                yield sse_event("token", {"text": assistant_reply})
+            else:
+                parts = []
+                async with aclosing(gemini_service.chat_stream(history, user_message)) as stream:
+                    async for text in stream:
+                        if await request.is_disconnected():
+                            # Leaving the block closes the upstream generation
+                            return
+                        parts.append(text)
+                        yield sse_event("token", {"text": text})
+                assistant_reply = "".join(parts)
+            if session is not None:
+                await record_chat_turn(session, user_message, assistant_reply, background_tasks)
+                yield sse_event("done", {"response": assistant_reply, "action": action, "session_id": session["id"]})
+                return
+            updated_history = history + [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": assistant_reply},
+            ]
+            yield sse_event("done", {"response": assistant_reply, "history": updated_history, "action": action})
+        except UpstreamOverloaded as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stats")
+async def get_stats():
+    return {
+        "intent_cache": gemini_service.intent_cache.stats(),
+        "intent_fast_path": gemini_service.fast_path.stats(),
+        "llm_executor": gemini_service.executor.stats(),
+        "chat_speculation": dict(speculation_stats, budget=CHAT_SPECULATION_BUDGET, gemini=CHAT_SPECULATE_GEMINI),
+        "ingest": ingest_service.stats() if ingest_service else {},
+        "user_response_cache": user_response_cache.stats(),
+        "resilience": {"gemini": gemini_service.resilience.stats(), "rag": rag_service.resilience.stats()},
+        "rate_limit": rate_limiter.stats() if rate_limiter else {},
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format
+    body = REGISTRY.render()
+    body += render_stats("intent_cache", gemini_service.intent_cache.stats(), counters={"hits", "misses", "evictions", "expirations"})
+    body += render_stats("intent_fast_path", gemini_service.fast_path.stats(), counters={"hits", "fallbacks"})
+    body += render_stats("llm_executor", gemini_service.executor.stats(), counters={"completed", "rejected"})
+    body += render_stats("chat_speculation", speculation_stats, counters={"started", "used", "cancelled"})
+    resilience_counters = {"opens", "calls", "failures", "timeouts", "short_circuited", "fallbacks", "hedges", "hedge_wins"}
+    body += render_stats("gemini_resilience", gemini_service.resilience.stats(), counters=resilience_counters)
+    body += render_stats("rag_resilience", rag_service.resilience.stats(), counters=resilience_counters)
+    body += render_stats("user_response_cache", user_response_cache.stats(), counters={"hits", "misses", "not_modified", "evictions"})
+    if ingest_service:
+        body += render_stats("ingest", ingest_service.stats(), counters={"accepted", "rejected", "flushed", "flushes", "retries", "failed"})
+    if rate_limiter:
+        # Per-class decisions are in promptfun_rate_limit_decisions_total
+        body += render_stats("rate_limit", rate_limiter.stats(), counters={"store_errors"})
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+# --- Fast JSON path for /user/* ---
+# Opt-in: build slotted types straight from trusted service dicts and encode
+# them with orjson, instead of constructing pydantic models that FastAPI then
+# validates and serializes again through response_model.
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in {"1", "true", "yes", "on"}
+FAST_TYPES = {UserProfile: FastUserProfile, Achievement: FastAchievement, Quest: FastQuest, Activity: FastActivity}
+
+def to_response(model, row: dict):
+    return FAST_TYPES[model].from_dict(row) if FAST_JSON else model(**row)
+
+def to_responses(model, rows: list) -> list:
+    if FAST_JSON:
+        fast_type = FAST_TYPES[model]
+        return [fast_type.from_dict(r) for r in rows]
+    return [model(**r) for r in rows]
+
+def render_json(content) -> bytes:
+    return fast_dumps(content) if FAST_JSON else JSONResponse(jsonable_encoder(content)).body
+
+def json_response(content):
+    # Fast path returns the encoded response directly so response_model is skipped
+    return FastJSONResponse(content) if FAST_JSON else content
+
+# --- Conditional GET for /user/* ---
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+async def cached_user_response(request: Request, address: str, key, build) -> Response:
+    """Serve a GET /user/* body from the per-address cache with a strong ETag.
+
+    `key` identifies the variant (section plus anything else the body depends
+    on); `build` produces the response model on a miss.
+    """
+    cached = user_response_cache.get(address, key)
+    if cached is None:
+        version = user_response_cache.version(address)
+        body = render_json(await build())
+        etag = user_response_cache.put(address, key, version, body)
     else:
-        assistant_reply = await gemini_service.chat(history, user_message)
-        updated_history.append({"role": "assistant", "content": assistant_reply})
-        return ChatResponse(response=assistant_reply, history=updated_history, action=None)
+        etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        user_response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 # --- User Profile (web2) ---
+def short_address(address):
+    return address[:6] + "..." + address[-4:]
+
+def new_user(address):
+    return {
+        "address": address,
+        "shortAddress": short_address(address),
+        "xp": 0,
+        "rank": 0,
+        "badge": "Newbie",
+        "joinDate": datetime.datetime.utcnow().strftime("%B %Y"),
+        "tokensCreated": 0,
+        "tokensTraded": 0,
+        "winRate": "0%",
+        "streak": 0,
+        "achievements": 0,
+        "totalTrades": 0,
+        "totalVolume": "0 APT",
+        "volumeApt": 0,
+        "largestTradeApt": 0
+    }
+
+async def load_user(address: str) -> dict:
+    # One atomic upsert: concurrent first visits cannot create duplicates
+    return await mongo_service.get_or_create_user(address, new_user(address))
+
+async def load_profile(address: str, xp: Optional[int], user: dict = None, record: bool = False,
+                       unlocked: Optional[int] = None) -> UserProfile:
+    """Profile for display. `xp` (from the client) only changes what is shown,
+    unless `record` is set: then it is stored and ranked (POST /user/profile).
+    `unlocked` is the achievement count when the caller already evaluated them."""
+    if user is None:
+        user = await load_user(address)
+    # The dashboard shares this document with the achievements section; work on a copy
+    user = dict(user)
+    if record and xp is not None and user.get("xp") != xp:
+        # XP lives onchain; keep the stored copy current so the leaderboard can rank it
+        await mongo_service.update_xp(address, xp)
+        user_response_cache.bump(address)
+        user["xp"] = xp
+    # Stored values only, so a read never moves anyone's rank
+    leaderboard_service.track(user)
+    if xp is None:
+        xp = user.get("xp", 0)
+    user["xp"] = xp
+    user["rank"] = leaderboard_service.rank(address, "xp")
+    user["level"] = calc_level(xp)
+    user["nextLevelXP"] = calc_next_level_xp(xp)
+    # The stored count lags until /user/achievements writes the unlocks; count from the rules instead
+    user["achievements"] = unlocked if unlocked is not None else sum(evaluate(user).values())
+    # Ingest keeps the numbers; the display fields are derived from them here
+    user["totalVolume"] = f"{format_quantity(rule_value(user, 'volumeApt'))} APT"
+    if "tradedTokens" in user:
+        user["tokensTraded"] = len(user["tradedTokens"])
+    return to_response(UserProfile, user)
+
 @app.get("/user/profile", response_model=UserProfile)
-async def get_user_profile(address: str = Query(...), xp: Optional[int] = Query(0)):
-    user = mongo_db.users.find_one({"address": address})
-    if not user:
-        user = {
-            "address": address,
-            "shortAddress": address[:6] + "..." + address[-4:],
-            "level": calc_level(xp),
-            "rank": 0,
-            "badge": "Newbie",
-            "joinDate": datetime.datetime.utcnow().strftime("%B %Y"),
-            "nextLevelXP": calc_next_level_xp(xp),
-            "tokensCreated": 0,
-            "tokensTraded": 0,
-            "winRate": "0%",
-            "streak": 0,
-            "achievements": 0,
-            "totalTrades": 0,
-            "totalVolume": "0 APT"
-        }
-        mongo_db.users.insert_one(user)
-    else:
-        user["level"] = calc_level(xp)
-        user["nextLevelXP"] = calc_next_level_xp(xp)
-    return UserProfile(**user)
+async def get_user_profile(request: Request, address: str = Query(...), xp: Optional[int] = Query(None)):
+    # Rank moves with other users' scores, so it is part of the cache key
+    key = ("profile", xp, leaderboard_service.rank(address, "xp"))
+    return await cached_user_response(request, address, key, lambda: load_profile(address, xp))
 
 @app.post("/user/profile", response_model=UserProfile)
 async def post_user_profile(req: UserXPRequest = Body(...)):
-    address = req.address
-    xp = req.xp
-    user = mongo_db.users.find_one({"address": address})
-    if not user:
-        user = {
-            "address": address,
-            "shortAddress": address[:6] + "..." + address[-4:],
-            "level": calc_level(xp),
-            "rank": 0,
-            "badge": "Newbie",
-            "joinDate": datetime.datetime.utcnow().strftime("%B %Y"),
-            "nextLevelXP": calc_next_level_xp(xp),
-            "tokensCreated": 0,
-            "tokensTraded": 0,
-            "winRate": "0%",
-            "streak": 0,
-            "achievements": 0,
-            "totalTrades": 0,
-            "totalVolume": "0 APT"
-        }
-        mongo_db.users.insert_one(user)
-    else:
-        user["level"] = calc_level(xp)
-        user["nextLevelXP"] = calc_next_level_xp(xp)
-    return UserProfile(**user)
+    # The one path that writes XP; GETs and the dashboard only display it
+    return json_response(await load_profile(req.address, req.xp, record=True))
 
 def calc_level(xp):
     return max(1, xp // 250 + 1)
@@ -149,150 +548,154 @@ def calc_level(xp):
 def calc_next_level_xp(xp):
     return ((xp // 250) + 1) * 250
 
+# --- Leaderboard ---
+@app.get("/leaderboard", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    metric: str = Query("xp"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric '{metric}', expected one of {sorted(LEADERBOARD_METRICS)}")
+    entries = [
+        LeaderboardEntry(shortAddress=short_address(e["address"]), **e)
+        for e in leaderboard_service.page(metric, offset, limit)
+    ]
+    return LeaderboardResponse(metric=metric, total=leaderboard_service.total(metric), offset=offset, entries=entries)
+
+# --- Dashboard (profile page in one request) ---
+DASHBOARD_SECTIONS = ("profile", "achievements", "quests", "activity")
+
+async def load_dashboard(address: str, xp: Optional[int], sections: set, activity_limit: int) -> dict:
+    async def user_sections():
+        # Profile and achievements share one read of the user document.
+        # Achievements go first so the profile's count matches the section.
+        user = await load_user(address) if "profile" in sections else None
+        achievements = unlocked = None
+        if "achievements" in sections:
+            rows = await achievement_service.get_achievements(address, user)
+            unlocked = sum(1 for row in rows if row["unlocked"])
+            achievements = to_responses(Achievement, rows)
+        profile = await load_profile(address, xp, user, unlocked=unlocked) if "profile" in sections else None
+        return profile, achievements
+
+    async def quests():
+        if "quests" in sections:
+            return to_responses(Quest, await quest_service.get_quests(address))
+
+    async def activity():
+        if "activity" in sections:
+            return await load_activity(address, None, activity_limit)
+
+    (profile, achievements), quest_list, activity_list = await asyncio.gather(user_sections(), quests(), activity())
+    loaded = {"profile": profile, "achievements": achievements, "quests": quest_list, "activity": activity_list}
+    # Sections that were not requested are left out
+    return {name: value for name, value in loaded.items() if name in sections}
+
+def parse_sections(fields: Optional[str]) -> set:
+    if not fields:
+        return set(DASHBOARD_SECTIONS)
+    sections = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sections - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections {sorted(unknown)}, expected any of {list(DASHBOARD_SECTIONS)}")
+    return sections
+
+@app.get("/user/dashboard", response_model=UserDashboard, response_model_exclude_none=True)
+async def get_user_dashboard(
+    request: Request,
+    address: str = Query(...),
+    xp: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated sections; all when omitted"),
+    activity_limit: int = Query(20, ge=1, le=100),
+):
+    sections = parse_sections(fields)
+    key = ("dashboard", tuple(sorted(sections)), xp, leaderboard_service.rank(address, "xp"), activity_limit)
+
+    return await cached_user_response(request, address, key, lambda: load_dashboard(address, xp, sections, activity_limit))
+
+@app.post("/user/dashboard", response_model=UserDashboard, response_model_exclude_none=True)
+async def post_user_dashboard(req: DashboardRequest = Body(...)):
+    return json_response(await load_dashboard(req.address, req.xp, parse_sections(req.fields), req.activity_limit))
+
 # --- Achievements (web2) ---
 @app.get("/user/achievements", response_model=List[Achievement])
-async def get_user_achievements(address: str = Query(...), xp: Optional[int] = Query(0)):
-    achs = list(mongo_db.achievements.find({"address": address}))
-    if not achs:
-        achs = [
-            {"title": "First Launch", "description": "Created your first token", "icon": "🚀", "unlocked": False, "rarity": "Common"},
-            {"title": "Volume Milestone", "description": "Traded over 10M APT", "icon": "💰", "unlocked": False, "rarity": "Rare"},
-            {"title": "Hot Streak", "description": "5 winning trades in a row", "icon": "🔥", "unlocked": False, "rarity": "Epic"},
-            {"title": "Meme Master", "description": "Launch 5 successful meme tokens", "icon": "🎭", "unlocked": False, "rarity": "Legendary"},
-            {"title": "Diamond Hands", "description": "Hold position for 30 days", "icon": "💎", "unlocked": False, "rarity": "Mythic"},
-            {"title": "Whale Hunter", "description": "Single trade over 1M APT", "icon": "🐋", "unlocked": False, "rarity": "Legendary"}
-        ]
-        for a in achs:
-            a["address"] = address
-        mongo_db.achievements.insert_many(achs)
-    for a in achs:
-        if a["title"] == "First Launch":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "tokensCreated": {"$gte": 1}}) is not None
-        if a["title"] == "Volume Milestone":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "totalVolume": {"$regex": r"[1-9][0-9]*M"}}) is not None
-        if a["title"] == "Hot Streak":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "streak": {"$gte": 5}}) is not None
-        if a["title"] == "Meme Master":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "tokensCreated": {"$gte": 5}}) is not None
-        if a["title"] == "Diamond Hands":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "holdDays": {"$gte": 30}}) is not None
-        if a["title"] == "Whale Hunter":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "largestTrade": {"$regex": r"[1-9][0-9]*M"}}) is not None
-    return [Achievement(**{k: v for k, v in a.items() if k != "_id" and k != "address"}) for a in achs]
+async def get_user_achievements(request: Request, address: str = Query(...), xp: Optional[int] = Query(None)):
+    async def build():
+        return to_responses(Achievement, await achievement_service.get_achievements(address))
+    return await cached_user_response(request, address, ("achievements",), build)
 
 @app.post("/user/achievements", response_model=List[Achievement])
 async def post_user_achievements(req: UserXPRequest = Body(...)):
-    address = req.address
-    xp = req.xp
-    achs = list(mongo_db.achievements.find({"address": address}))
-    if not achs:
-        achs = [
-            {"title": "First Launch", "description": "Created your first token", "icon": "🚀", "unlocked": False, "rarity": "Common"},
-            {"title": "Volume Milestone", "description": "Traded over 10M APT", "icon": "💰", "unlocked": False, "rarity": "Rare"},
-            {"title": "Hot Streak", "description": "5 winning trades in a row", "icon": "🔥", "unlocked": False, "rarity": "Epic"},
-            {"title": "Meme Master", "description": "Launch 5 successful meme tokens", "icon": "🎭", "unlocked": False, "rarity": "Legendary"},
-            {"title": "Diamond Hands", "description": "Hold position for 30 days", "icon": "💎", "unlocked": False, "rarity": "Mythic"},
-            {"title": "Whale Hunter", "description": "Single trade over 1M APT", "icon": "🐋", "unlocked": False, "rarity": "Legendary"}
-        ]
-        for a in achs:
-            a["address"] = address
-        mongo_db.achievements.insert_many(achs)
-    for a in achs:
-        if a["title"] == "First Launch":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "tokensCreated": {"$gte": 1}}) is not None
-        if a["title"] == "Volume Milestone":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "totalVolume": {"$regex": r"[1-9][0-9]*M"}}) is not None
-        if a["title"] == "Hot Streak":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "streak": {"$gte": 5}}) is not None
-        if a["title"] == "Meme Master":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "tokensCreated": {"$gte": 5}}) is not None
-        if a["title"] == "Diamond Hands":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "holdDays": {"$gte": 30}}) is not None
-        if a["title"] == "Whale Hunter":
-            a["unlocked"] = mongo_db.users.find_one({"address": address, "largestTrade": {"$regex": r"[1-9][0-9]*M"}}) is not None
-    return [Achievement(**{k: v for k, v in a.items() if k != "_id" and k != "address"}) for a in achs]
+    achs = await achievement_service.get_achievements(req.address)
+    return json_response(to_responses(Achievement, achs))
 
 # --- Quests (web2) ---
 @app.get("/user/quests", response_model=List[Quest])
-async def get_user_quests(address: str = Query(...), xp: Optional[int] = Query(0)):
-    quests = list(mongo_db.quests.find({"address": address}))
-    if not quests:
-        quests = [
-            {"title": "Daily Trader", "description": "Make 5 trades today", "progress": 0, "total": 5, "reward": "50 XP", "timeLeft": "24h"},
-            {"title": "Token Creator", "description": "Launch 3 tokens this week", "progress": 0, "total": 3, "reward": "200 XP", "timeLeft": "7d"},
-            {"title": "Volume King", "description": "Trade 100 APT this month", "progress": 0, "total": 100, "reward": "500 XP", "timeLeft": "30d"},
-            {"title": "Social Butterfly", "description": "Share 3 tokens on social", "progress": 0, "total": 3, "reward": "100 XP", "timeLeft": "7d"}
-        ]
-        for q in quests:
-            q["address"] = address
-        mongo_db.quests.insert_many(quests)
-    return [Quest(**{k: v for k, v in q.items() if k != "_id" and k != "address"}) for q in quests]
+async def get_user_quests(request: Request, address: str = Query(...), xp: Optional[int] = Query(None)):
+    async def build():
+        return to_responses(Quest, await quest_service.get_quests(address))
+    return await cached_user_response(request, address, ("quests",), build)
 
 @app.post("/user/quests", response_model=List[Quest])
 async def post_user_quests(req: UserXPRequest = Body(...)):
-    address = req.address
-    xp = req.xp
-    quests = list(mongo_db.quests.find({"address": address}))
-    if not quests:
-        quests = [
-            {"title": "Daily Trader", "description": "Make 5 trades today", "progress": 0, "total": 5, "reward": "50 XP", "timeLeft": "24h"},
-            {"title": "Token Creator", "description": "Launch 3 tokens this week", "progress": 0, "total": 3, "reward": "200 XP", "timeLeft": "7d"},
-            {"title": "Volume King", "description": "Trade 100 APT this month", "progress": 0, "total": 100, "reward": "500 XP", "timeLeft": "30d"},
-            {"title": "Social Butterfly", "description": "Share 3 tokens on social", "progress": 0, "total": 3, "reward": "100 XP", "timeLeft": "7d"}
-        ]
-        for q in quests:
-            q["address"] = address
-        mongo_db.quests.insert_many(quests)
-    return [Quest(**{k: v for k, v in q.items() if k != "_id" and k != "address"}) for q in quests]
+    quests = await quest_service.get_quests(req.address)
+    return json_response(to_responses(Quest, quests))
+
+@app.post("/user/share")
+async def post_user_share(req: ShareRequest = Body(...)):
+    # Counts toward share quests; the share itself happens client-side
+    await quest_service.record(req.address, "share")
+    user_response_cache.bump(req.address)
+    return {"status": "shared"}
 
 # --- Activity (web2) ---
+async def load_activity(address: str, before: Optional[datetime.datetime], limit: int,
+                        before_id: Optional[str] = None) -> list:
+    if before is not None and before.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        before = before.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    cursor_id = None
+    if before_id is not None:
+        if before is None or not ObjectId.is_valid(before_id):
+            raise HTTPException(status_code=400, detail="before_id must be an activity id, sent together with before")
+        cursor_id = ObjectId(before_id)
+    stored = await mongo_service.get_activity(address, before, cursor_id, limit)
+    return to_responses(Activity, merge_activity(stored, first_page=before is None))
+
 @app.get("/user/activity", response_model=List[Activity])
-async def get_user_activity(address: str = Query(...), xp: Optional[int] = Query(0)):
-    acts = list(mongo_db.activity.find({"address": address}))
-    if not acts:
-        acts = [
-            {"action": "Launched", "token": "$ROCKET", "amount": "1000 tokens", "time": "2 hours ago", "type": "launch"},
-            {"action": "Bought", "token": "$DOGE", "amount": "500 APT", "time": "5 hours ago", "type": "buy"},
-            {"action": "Sold", "token": "$PEPE", "amount": "1.2K tokens", "time": "1 day ago", "type": "sell"},
-            {"action": "Launched", "token": "$MOON", "amount": "2000 tokens", "time": "3 days ago", "type": "launch"},
-            {"action": "Bought", "token": "$CYBER", "amount": "250 APT", "time": "1 week ago", "type": "buy"}
-        ]
-        for a in acts:
-            a["address"] = address
-        mongo_db.activity.insert_many(acts)
-    return [Activity(**{k: v for k, v in a.items() if k != "_id" and k != "address"}) for a in acts]
+async def get_user_activity(
+    request: Request,
+    address: str = Query(...),
+    xp: Optional[int] = Query(None),
+    before: Optional[datetime.datetime] = Query(None),
+    before_id: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+):
+    key = ("activity", before, before_id, limit)
+    return await cached_user_response(request, address, key, lambda: load_activity(address, before, limit, before_id))
 
 @app.post("/user/activity", response_model=List[Activity])
-async def post_user_activity(req: UserXPRequest = Body(...)):
-    address = req.address
-    xp = req.xp
-    acts = list(mongo_db.activity.find({"address": address}))
-    if not acts:
-        acts = [
-            {"action": "Launched", "token": "$ROCKET", "amount": "1000 tokens", "time": "2 hours ago", "type": "launch"},
-            {"action": "Bought", "token": "$DOGE", "amount": "500 APT", "time": "5 hours ago", "type": "buy"},
-            {"action": "Sold", "token": "$PEPE", "amount": "1.2K tokens", "time": "1 day ago", "type": "sell"},
-            {"action": "Launched", "token": "$MOON", "amount": "2000 tokens", "time": "3 days ago", "type": "launch"},
-            {"action": "Bought", "token": "$CYBER", "amount": "250 APT", "time": "1 week ago", "type": "buy"}
-        ]
-        for a in acts:
-            a["address"] = address
-        mongo_db.activity.insert_many(acts)
-    return [Activity(**{k: v for k, v in a.items() if k != "_id" and k != "address"}) for a in acts]
+async def post_user_activity(req: ActivityRequest = Body(...)):
+    return json_response(await load_activity(req.address, req.before, req.limit, req.before_id))
 
+# --- Token actions ---
+# Acknowledged once queued; stats, activity, quests and the token record are
+# written behind in batches by IngestService.
 @app.post("/launch-token")
-async def launch_token(data: dict):
-    # TODO: Interact with MongoDB and blockchain
-    return {"status": "launched", "raw": data}
+async def launch_token(req: LaunchTokenRequest):
+    token = req.dict(exclude={"address"})
+    ingest_service.submit({"type": "launch", "address": req.address, "symbol": req.symbol, "token": token})
+    return {"status": "launched", "raw": req.dict()}
 
 @app.post("/buy-token")
-async def buy_token(data: dict):
-    # TODO: Interact with MongoDB and blockchain
-    return {"status": "bought", "raw": data}
+async def buy_token(req: TradeRequest):
+    ingest_service.submit({"type": "buy", **req.dict()})
+    return {"status": "bought", "raw": req.dict()}
 
 @app.post("/sell-token")
-async def sell_token(data: dict):
-    # TODO: Interact with MongoDB and blockchain
-    return {"status": "sold", "raw": data}
+async def sell_token(req: TradeRequest):
+    ingest_service.submit({"type": "sell", **req.dict()})
+    return {"status": "sold", "raw": req.dict()}
 
 # Add more endpoints and service integrations as needed 
\ No newline at end of file
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Optional
+import datetime
+
+# Slotted, unvalidated counterparts of the /user/* response models in
+# prompt_models.py, used by the fast JSON path for data the server built
+# itself. Field names and order must match the pydantic models.
+
+class _FromDict:
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        # Extra keys (e.g. _id, xp on user documents) are ignored, like pydantic does
+        return cls(**{name: data[name] for name in cls.__dataclass_fields__ if name in data})
+
+@dataclass(slots=True)
+class FastUserProfile(_FromDict):
+    address: str
+    shortAddress: str
+    level: int
+    rank: int
+    badge: str
+    joinDate: str
+    nextLevelXP: int
+    tokensCreated: int
+    tokensTraded: int
+    winRate: str
+    streak: int
+    achievements: int
+    totalTrades: int
+    totalVolume: str
+
+@dataclass(slots=True)
+class FastAchievement(_FromDict):
+    title: str
+    description: str
+    icon: str
+    unlocked: bool
+    rarity: str
+
+@dataclass(slots=True)
+class FastQuest(_FromDict):
+    title: str
+    description: str
+    progress: int
+    total: int
+    reward: str
+    timeLeft: str
+
+@dataclass(slots=True)
+class FastActivity(_FromDict):
+    action: str
+    token: str
+    amount: str
+    time: str
+    type: str
+    ts: Optional[datetime.datetime] = None
+    id: Optional[str] = None
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
+import datetime
 
 class PromptRequest(BaseModel):
     prompt: str
@@ -9,6 +10,19 @@ class PromptResponse(BaseModel):
     entities: dict
     raw: dict
 
+class BatchPromptRequest(BaseModel):
+    prompts: List[str]
+
+class BatchPromptResult(BaseModel):
+    index: int
+    intent: Optional[str] = None
+    entities: Optional[dict] = None
+    raw: Optional[dict] = None
+    error: Optional[str] = None
+
+class BatchPromptResponse(BaseModel):
+    results: List[BatchPromptResult]
+
 class RagQuestionRequest(BaseModel):
     question: str
 
@@ -25,13 +39,20 @@ class ActionResponse(BaseModel):
     params: Dict
 
 class ChatRequest(BaseModel):
-    history: List[ChatMessage]
+    # Full history is only needed without a session; with session_id the
+    # server keeps the conversation and this can be left empty.
+    history: List[ChatMessage] = []
     message: str
+    session_id: Optional[str] = None
+    # Max upstream calls /chat may start speculatively for this request
+    # (capped by the server's CHAT_SPECULATION_BUDGET; 0 disables)
+    speculation_budget: Optional[int] = None
 
 class ChatResponse(BaseModel):
     response: str
-    history: List[ChatMessage]
+    history: List[ChatMessage] = []
     action: Optional[ActionResponse] = None
+    session_id: Optional[str] = None
 
 # User profile, achievements, quests, activity
 class UserProfile(BaseModel):
@@ -71,8 +92,57 @@ class Activity(BaseModel):
     amount: str
     time: str
     type: str
+    ts: Optional[datetime.datetime] = None
+    # With ts, the cursor for the next page (before / before_id)
+    id: Optional[str] = None
+
+class UserDashboard(BaseModel):
+    # Sections not requested are omitted from the response
+    profile: Optional[UserProfile] = None
+    achievements: Optional[List[Achievement]] = None
+    quests: Optional[List[Quest]] = None
+    activity: Optional[List[Activity]] = None
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    address: str
+    shortAddress: str
+    value: float
+
+class LeaderboardResponse(BaseModel):
+    metric: str
+    total: int
+    offset: int
+    entries: List[LeaderboardEntry]
 
 # For POST endpoints
 class UserXPRequest(BaseModel):
     address: str
-    xp: int = 0 
\ No newline at end of file
+    # Omitted: use the stored XP
+    xp: Optional[int] = None
+
+class ActivityRequest(UserXPRequest):
+    before: Optional[datetime.datetime] = None
+    before_id: Optional[str] = None
+    limit: int = Field(20, ge=1, le=100)
+
+class ShareRequest(BaseModel):
+    address: str
+    token: Optional[str] = None
+
+class LaunchTokenRequest(BaseModel):
+    address: str
+    symbol: str
+    name: Optional[str] = None
+    supply: float = Field(0, ge=0)
+    description: Optional[str] = None
+
+class TradeRequest(BaseModel):
+    address: str
+    symbol: str
+    amountApt: float = Field(..., ge=0)
+    tokenAmount: Optional[float] = Field(None, ge=0)
+
+class DashboardRequest(UserXPRequest):
+    fields: Optional[str] = None
+    activity_limit: int = Field(20, ge=1, le=100)
@@ -0,0 +1,66 @@
+import re
+
+# Each achievement is unlocked when the numeric user field reaches the threshold.
+# Adding an achievement is a new entry here, not a new query.
+ACHIEVEMENT_RULES = [
+    {"title": "First Launch", "description": "Created your first token", "icon": "🚀", "rarity": "Common", "field": "tokensCreated", "min": 1},
+    {"title": "Volume Milestone", "description": "Traded over 10M APT", "icon": "💰", "rarity": "Rare", "field": "volumeApt", "min": 10_000_000},
+    {"title": "Hot Streak", "description": "5 winning trades in a row", "icon": "🔥", "rarity": "Epic", "field": "streak", "min": 5},
+    {"title": "Meme Master", "description": "Launch 5 successful meme tokens", "icon": "🎭", "rarity": "Legendary", "field": "tokensCreated", "min": 5},
+    {"title": "Diamond Hands", "description": "Hold position for 30 days", "icon": "💎", "rarity": "Mythic", "field": "holdDays", "min": 30},
+    {"title": "Whale Hunter", "description": "Single trade over 1M APT", "icon": "🐋", "rarity": "Legendary", "field": "largestTradeApt", "min": 1_000_000},
+]
+
+DISPLAY_FIELDS = ("title", "description", "icon", "rarity")
+
+# Older user documents only carry the display strings for these numeric fields
+LEGACY_STRING_FIELDS = {"volumeApt": "totalVolume", "largestTradeApt": "largestTrade"}
+
+_AMOUNT_RE = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*([KMB]?)", re.IGNORECASE)
+_SUFFIXES = {"": 1, "K": 1_000, "M": 1_000_000, "B": 1_000_000_000}
+
+def parse_amount(value) -> float:
+    # "15.2M APT" -> 15200000.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _AMOUNT_RE.match(str(value or ""))
+    if not match:
+        return 0.0
+    return float(match.group(1)) * _SUFFIXES[match.group(2).upper()]
+
+def rule_projection() -> dict:
+    fields = {rule["field"] for rule in ACHIEVEMENT_RULES}
+    fields |= {LEGACY_STRING_FIELDS[f] for f in fields if f in LEGACY_STRING_FIELDS}
+    return {"_id": 0, "achievements": 1, "achievementUnlocks": 1, **{f: 1 for f in fields}}
+
+def rule_value(user: dict, field: str) -> float:
+    if field in user:
+        return parse_amount(user[field])
+    if field in LEGACY_STRING_FIELDS:
+        return parse_amount(user.get(LEGACY_STRING_FIELDS[field]))
+    return 0.0
+
+def evaluate(user: dict) -> dict:
+    # title -> unlocked, evaluated in memory against a single user document
+    return {rule["title"]: rule_value(user, rule["field"]) >= rule["min"] for rule in ACHIEVEMENT_RULES}
+
+class AchievementService:
+    def __init__(self, mongo_service, on_write=None):
+        self.mongo = mongo_service
+        # Called with the address after unlocks are written (cache invalidation)
+        self.on_write = on_write
+
+    async def get_achievements(self, address: str, user: dict = None) -> list:
+        # The rules are the template; the only per-user state is the list of
+        # unlocked titles on the user document, read in the same projection.
+        # Callers that already hold the full user document can pass it in.
+        if user is None:
+            user = await self.mongo.get_user(address, rule_projection()) or {}
+        unlocked = evaluate(user)
+        titles = [rule["title"] for rule in ACHIEVEMENT_RULES if unlocked[rule["title"]]]
+        # Only write when an unlock actually changed
+        if user and (user.get("achievementUnlocks", []) != titles or user.get("achievements") != len(titles)):
+            await self.mongo.update_user_fields(address, {"achievementUnlocks": titles, "achievements": len(titles)})
+            if self.on_write:
+                self.on_write(address)
+        return [{**{k: rule[k] for k in DISPLAY_FIELDS}, "unlocked": unlocked[rule["title"]]} for rule in ACHIEVEMENT_RULES]
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import hashlib
+import time
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    Used from the event loop only, so it does no locking.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class UserResponseCache:
+    """Rendered /user/* response bodies per address, with strong ETags.
+
+    Each address has a version; writes bump it, dropping its cached bodies.
+    A body is only stored if the version it was built under is still current,
+    so a read racing a write never caches stale data. Memory is bounded by
+    total body bytes (whole addresses are evicted LRU), and entries also
+    expire after `ttl` seconds because some fields are time-relative.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 30):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # address -> {"version", "bodies": {key: (expires_at, etag, body)}}
+        self._bytes = 0
+        # Version reported for addresses with no entry. It moves forward on every
+        # bump and eviction, so a build that started before either is not stored.
+        self._clock = 0
+        self._absent_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def version(self, address: str) -> int:
+        entry = self._data.get(address)
+        return entry["version"] if entry else self._absent_version
+
+    def bump(self, address: str):
+        # Drop the address; moving the absent version forward also voids any
+        # build that read the old version before this write
+        entry = self._data.pop(address, None)
+        if entry is not None:
+            self._bytes -= sum(len(body) for _, _, body in entry["bodies"].values())
+        self._clock += 1
+        self._absent_version = self._clock
+
+    def get(self, address: str, key):
+        # -> (etag, body) or None
+        entry = self._data.get(address)
+        cached = entry["bodies"].get(key) if entry else None
+        if cached is None or cached[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._data.move_to_end(address)
+        self.hits += 1
+        return cached[1], cached[2]
+
+    def put(self, address: str, key, version: int, body: bytes) -> str:
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        if self.max_bytes <= 0 or version != self.version(address):
+            return etag
+        entry = self._data.setdefault(address, {"version": version, "bodies": {}})
+        old = entry["bodies"].get(key)
+        if old is not None:
+            self._bytes -= len(old[2])
+        entry["bodies"][key] = (time.monotonic() + self.ttl, etag, body)
+        self._bytes += len(body)
+        self._data.move_to_end(address)
+        while self._bytes > self.max_bytes and self._data:
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= sum(len(body) for _, _, body in evicted["bodies"].values())
+            self._clock += 1
+            self._absent_version = self._clock
+            self.evictions += 1
+        return etag
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "addresses": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
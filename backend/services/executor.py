@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import threading
+import time
+
+class UpstreamOverloaded(Exception):
+    """Raised instead of queueing when an upstream pool is saturated."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is overloaded, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class BoundedExecutor:
+    """Dedicated thread pool for blocking upstream SDK calls with admission control.
+
+    At most `max_workers` calls run and `max_queue` wait; anything beyond that
+    is rejected immediately with UpstreamOverloaded so callers can shed load.
+    """
+
+    def __init__(self, name: str, max_workers: int = 16, max_queue: int = 64):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0  # queued + running
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+
+    def _retry_after(self) -> int:
+        # Time for the current backlog to drain at the observed service rate
+        avg_service = self.service_total / self.completed if self.completed else 1.0
+        backlog = max(1, self._admitted - self.max_workers + 1)
+        return max(1, math.ceil(avg_service * backlog / self.max_workers))
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise UpstreamOverloaded(self.name, self._retry_after())
+            self._admitted += 1
+        enqueued = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            with self._lock:
+                self._running += 1
+                waited = started - enqueued
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self.service_total += time.monotonic() - started
+
+        def release(_):
+            # Released when the job really finishes, even if the awaiting request was cancelled
+            with self._lock:
+                self._admitted -= 1
+
+        future = self._pool.submit(job)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._admitted - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_avg_seconds": self.wait_total / started if started else 0.0,
+                "wait_max_seconds": self.wait_max,
+            }
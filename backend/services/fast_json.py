@@ -0,0 +1,34 @@
+from fastapi.responses import Response
+import dataclasses
+import datetime
+import json
+
+# Compiled JSON encoding for the opt-in fast response path (FAST_JSON=true).
+# orjson serializes dataclasses (including the slotted types in
+# models/fast_models.py) and datetimes natively; without it the stdlib
+# encoder is used with an equivalent fallback.
+
+try:
+    import orjson
+except ImportError:  # pip install orjson
+    orjson = None
+
+def _default(value):
+    if dataclasses.is_dataclass(value):
+        return {name: getattr(value, name) for name in value.__dataclass_fields__}
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response for trusted data; FastAPI skips response_model when a Response is returned."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -3,11 +3,91 @@ import json as _json
 from google import genai
 import asyncio
 import re
+import threading
+from services.cache import TTLCache
+from services.intent_rules import IntentClassifier
+from services.executor import BoundedExecutor, UpstreamOverloaded
+from services.metrics import track_upstream
+from services.resilience import CircuitOpen, ResilientUpstream
+
+INTENT_INSTRUCTIONS = (
+    "You are an intent extraction agent. Given a user prompt, extract the intent (action) and any entities (parameters). "
+    "Respond ONLY with a valid JSON object, no commentary, no markdown, no code block, no explanation. "
+    "Format: {\"intent\": ..., \"entities\": {...}, \"raw\": ...}. "
+    "If the prompt is a question, intent is 'ask'. If it's a command (buy, launch, sell, etc.), intent is the action. "
+    "Entities may include token name, amount, etc."
+)
+
+# Canned reply while the circuit is open, instead of waiting on a dead upstream
+CHAT_FALLBACK = "The assistant is temporarily unavailable. Please try again in a moment."
+# Short, user-facing and free of side effects, so safe to send twice
+HEDGED_OPERATIONS = {"extract_intent", "chat"}
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
 
 class GeminiService:
     def __init__(self):
-        self.client = genai.Client()
+        # GEMINI_BASE_URL points the SDK at a proxy or a local stand-in (see bench/)
+        self.base_url = os.getenv("GEMINI_BASE_URL")
+        # Created on first use (or during warmup) so importing the app never
+        # depends on credentials or the network
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = "gemini-1.5-flash"
+        # Blocking SDK calls get their own pool; a full queue fails fast (503)
+        self.executor = BoundedExecutor(
+            "gemini",
+            max_workers=int(os.getenv("LLM_MAX_WORKERS", "16")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+        )
+        # Breaker + adaptive timeouts around every generate call
+        self.resilience = ResilientUpstream.from_env(
+            "gemini",
+            max_timeout=float(os.getenv("GEMINI_TIMEOUT", "30")),
+            hedge=os.getenv("GEMINI_HEDGE", "false").lower() in {"1", "true", "yes", "on"},
+        )
+        # Resolves unambiguous buy/sell/launch commands without an LLM call
+        self.fast_path = IntentClassifier(
+            enabled=os.getenv("INTENT_FAST_PATH", "true").lower() in {"1", "true", "yes", "on"},
+            min_confidence=float(os.getenv("INTENT_FAST_PATH_MIN_CONFIDENCE", "0.9")),
+        )
+        # /parse/batch: prompts per Gemini request and packs in flight per batch
+        self.batch_pack_size = int(os.getenv("INTENT_BATCH_PACK_SIZE", "20"))
+        self.batch_concurrency = int(os.getenv("INTENT_BATCH_CONCURRENCY", "4"))
+        # normalized prompt -> parsed intent; only successful parses are stored
+        self.intent_cache = TTLCache(
+            maxsize=int(os.getenv("INTENT_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+        )
+
+    @property
+    def client(self) -> genai.Client:
+        # Also reached from executor threads, hence the lock
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = genai.Client(http_options={"base_url": self.base_url} if self.base_url else None)
+        return self._client
+
+    async def warmup(self):
+        # Builds the client, starts a pool thread and opens the SDK's HTTPS
+        # connection with a cheap model lookup, which also validates the key
+        def sync_call():
+            return self.client.models.get(model=self.model)
+        async with track_upstream("gemini", "warmup"):
+            await self.executor.run(sync_call)
+
+    async def _generate(self, operation: str, contents: str):
+        # Every blocking SDK call goes through the bounded pool and is timed per operation
+        # An abandoned attempt (timeout, lost hedge) still holds its pool thread until the SDK returns
+        def sync_call():
+            return self.client.models.generate_content(model=self.model, contents=contents)
+
+        async def attempt():
+            async with track_upstream("gemini", operation):
+                return await self.executor.run(sync_call)
+        return await self.resilience.call(operation, attempt, hedge=operation in HEDGED_OPERATIONS)
 
     def _extract_json(self, text):
         # Try to find the first {...} block in the response
@@ -16,45 +96,166 @@ class GeminiService:
             return _json.loads(match.group(0))
         raise ValueError("No JSON object found")
 
+    def _lookup_intent(self, prompt: str):
+        # -> (cache key, result or None) from the local fast path or the cache
+        local = self.fast_path.classify(prompt)
+        if local is not None:
+            return None, local
+        key = normalize_prompt(prompt)
+        cached = self.intent_cache.get(key)
+        if cached is not None:
+            return key, dict(cached) | {"cached": True}
+        return key, None
+
+    def _remember_intent(self, key: str, result: dict):
+        if "error" not in result and result.get("intent", "unknown") != "unknown":
+            self.intent_cache.set(key, result)
+
     async def extract_intent(self, prompt: str) -> dict:
-        system_prompt = (
-            "You are an intent extraction agent. Given a user prompt, extract the intent (action) and any entities (parameters). "
-            "Respond ONLY with a valid JSON object, no commentary, no markdown, no code block, no explanation. "
-            "Format: {\"intent\": ..., \"entities\": {...}, \"raw\": ...}. "
-            "If the prompt is a question, intent is 'ask'. If it's a command (buy, launch, sell, etc.), intent is the action. "
-            "Entities may include token name, amount, etc."
-        )
-        def sync_call():
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=f"{system_prompt}\n\n{prompt}"
-            )
-            return response
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, sync_call)
+        key, result = self._lookup_intent(prompt)
+        if result is not None:
+            return result
+        try:
+            result = await self._extract_intent_uncached(prompt)
+        except CircuitOpen:
+            return self._fallback_intent(prompt)
+        self._remember_intent(key, result)
+        return result
+
+    def _fallback_intent(self, prompt: str) -> dict:
+        # Gemini is down. The fast path already turned this prompt down, and a
+        # low-confidence rule match ("create account") must not become a wallet action.
+        self.resilience.fallbacks += 1
+        return {"intent": "unknown", "entities": {}, "error": "Gemini unavailable", "fallback": True}
+
+    async def _extract_intent_uncached(self, prompt: str) -> dict:
+        response = await self._generate("extract_intent", f"{INTENT_INSTRUCTIONS}\n\n{prompt}")
         try:
             parsed = self._extract_json(response.text)
             return parsed | {"raw_gemini": response}
         except Exception as e:
             return {"intent": "unknown", "entities": {}, "raw_gemini": str(e), "error": "Failed to parse Gemini response"}
 
-    async def chat(self, history: list, message: str) -> str:
+    async def extract_intents(self, prompts: list) -> list:
+        """Batch version of extract_intent. Returns one dict or Exception per prompt, in order.
+
+        Prompts not answered by the fast path or cache are de-duplicated and
+        packed several to a Gemini request; a pack whose answer cannot be
+        matched back to its prompts is retried one prompt at a time.
+        """
+        results = [None] * len(prompts)
+        pending = {}  # cache key -> indexes of prompts with that key
+        for i, prompt in enumerate(prompts):
+            key, result = self._lookup_intent(prompt)
+            if result is not None:
+                results[i] = result
+            else:
+                pending.setdefault(key, []).append(i)
+        keys = list(pending)
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run_pack(pack):
+            async with semaphore:
+                try:
+                    return await self._extract_intent_pack([prompts[pending[k][0]] for k in pack])
+                except UpstreamOverloaded as e:
+                    # Retrying one by one would only add to the overload
+                    return e
+                except Exception as e:
+                    print(f"Batched intent extraction failed, retrying individually: {e}")
+                    return None
+
+        async def run_single(key):
+            async with semaphore:
+                try:
+                    return await self._extract_intent_uncached(prompts[pending[key][0]])
+                except Exception as e:
+                    return e
+
+        packs = [keys[i:i + self.batch_pack_size] for i in range(0, len(keys), self.batch_pack_size)]
+        resolved = {}
+        retry = []
+        for pack, parsed in zip(packs, await asyncio.gather(*(run_pack(p) for p in packs))):
+            if parsed is None:
+                retry.extend(pack)
+            elif isinstance(parsed, Exception):
+                resolved.update((k, parsed) for k in pack)
+            else:
+                resolved.update(zip(pack, parsed))
+        resolved.update(zip(retry, await asyncio.gather(*(run_single(k) for k in retry))))
+        for key, result in resolved.items():
+            if isinstance(result, dict):
+                self._remember_intent(key, result)
+            for i in pending[key]:
+                results[i] = result
+        return results
+
+    async def _extract_intent_pack(self, prompts: list) -> list:
+        if len(prompts) == 1:
+            return [await self._extract_intent_uncached(prompts[0])]
+        numbered = "\n".join(f"{i + 1}. {_json.dumps(p)}" for i, p in enumerate(prompts))
+        contents = (
+            f"{INTENT_INSTRUCTIONS}\n\n"
+            f"There are {len(prompts)} numbered prompts below. Respond ONLY with a JSON array of exactly "
+            f"{len(prompts)} such objects, one per prompt, in the same order.\n\n{numbered}"
+        )
+        response = await self._generate("extract_intent_batch", contents)
+        match = re.search(r'\[.*\]', response.text, re.DOTALL)
+        if not match:
+            raise ValueError("No JSON array found")
+        parsed = _json.loads(match.group(0))
+        if not isinstance(parsed, list) or len(parsed) != len(prompts) or not all(isinstance(p, dict) for p in parsed):
+            raise ValueError(f"Expected {len(prompts)} results")
+        return [p | {"batched": True} for p in parsed]
+
+    def _chat_prompt(self, history: list, message: str) -> str:
         # history: list of {"role": ..., "content": ...}
-        def sync_call():
-            contents = []
-            for msg in history:
-                contents.append(f"{msg['role'].capitalize()}: {msg['content']}")
-            contents.append(f"User: {message}")
-            prompt = "\n".join(contents)
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt
-            )
-            return response
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, sync_call)
+        contents = []
+        for msg in history:
+            contents.append(f"{msg['role'].capitalize()}: {msg['content']}")
+        contents.append(f"User: {message}")
+        return "\n".join(contents)
+
+    async def chat(self, history: list, message: str) -> str:
+        try:
+            response = await self._generate("chat", self._chat_prompt(history, message))
+        except CircuitOpen:
+            self.resilience.fallbacks += 1
+            return CHAT_FALLBACK
         return response.text
 
+    async def summarize(self, summary: str, messages: list) -> str:
+        # Fold older chat turns into a short running summary for session history
+        instructions = (
+            "Update the running summary of a conversation between a user and the Prompt.fun assistant. "
+            "Keep facts, tokens, amounts and open questions; drop pleasantries. Respond with the summary only, under 150 words."
+        )
+        turns = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+        prompt = f"{instructions}\n\nCurrent summary:\n{summary or '(none)'}\n\nNew turns:\n{turns}"
+        response = await self._generate("summarize", prompt)
+        return response.text.strip()
+
+    async def chat_stream(self, history: list, message: str):
+        # Yields text chunks as the model produces them. Closing this generator
+        # (e.g. the client went away) closes the upstream stream as well.
+        # Streams only go through the breaker; their length has no useful timeout.
+        try:
+            async with self.resilience.guarded(), track_upstream("gemini", "chat_stream"):
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=self._chat_prompt(history, message)
+                )
+                try:
+                    async for chunk in stream:
+                        if chunk.text:
+                            yield chunk.text
+                finally:
+                    await stream.aclose()
+        except CircuitOpen:
+            # Only raised on entry, before anything was yielded
+            self.resilience.fallbacks += 1
+            yield CHAT_FALLBACK
+
     def send_prompt(self, prompt: str) -> dict:
         # TODO: Call Gemini API and return parsed intent
         return {"intent": "stub", "entities": {}, "raw": prompt} 
\ No newline at end of file
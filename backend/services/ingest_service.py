@@ -0,0 +1,257 @@
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from services.executor import UpstreamOverloaded
+from services.quest_service import event_increments, counter_update
+import asyncio
+import datetime
+import math
+import time
+
+ACTIVITY_ACTIONS = {"buy": "Bought", "sell": "Sold", "launch": "Launched"}
+# Inserts whose rows carry an _id fixed at acceptance: a duplicate key on retry means already written
+INSERT_COLLECTIONS = {"activity", "tokens"}
+DUPLICATE_KEY = 11000
+
+def format_quantity(value: float) -> str:
+    for suffix, size in (("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(value) >= size:
+            return f"{value / size:.3g}{suffix}"
+    return f"{value:g}"
+
+class _Pending:
+    """Everything accepted since the last flush, coalesced per address."""
+
+    def __init__(self):
+        self.events = 0
+        self.user_inc = {}       # address -> {field: delta}
+        self.user_max = {}       # address -> {field: value}
+        self.traded = {}         # address -> symbols traded (distinct, for tokensTraded)
+        self.quest_inc = {}      # address -> {counter: delta}
+        self.activity = []       # activity rows, ts set at acceptance
+        self.tokens = []         # launched token documents
+        self.ops = None          # collection -> operations still to write, built on the first attempt
+        self.attempts = 0
+
+    def add(self, event: dict):
+        address = event["address"]
+        kind = event["type"]
+        amount_apt = float(event.get("amountApt") or 0)
+        inc = self.user_inc.setdefault(address, {})
+        if kind == "launch":
+            inc["tokensCreated"] = inc.get("tokensCreated", 0) + 1
+            self.tokens.append(dict(event["token"], _id=ObjectId(), creator=address, createdAt=event["ts"]))
+            amount = f"{format_quantity(float(event['token'].get('supply') or 0))} tokens"
+        else:
+            inc["totalTrades"] = inc.get("totalTrades", 0) + 1
+            inc["volumeApt"] = inc.get("volumeApt", 0) + amount_apt
+            largest = self.user_max.setdefault(address, {})
+            largest["largestTradeApt"] = max(largest.get("largestTradeApt", 0), amount_apt)
+            self.traded.setdefault(address, set()).add(event["symbol"].upper())
+            token_amount = event.get("tokenAmount")
+            if kind == "sell" and token_amount:
+                amount = f"{format_quantity(float(token_amount))} tokens"
+            else:
+                amount = f"{format_quantity(amount_apt)} APT"
+        quest = self.quest_inc.setdefault(address, {})
+        for name, delta in event_increments(kind, amount_apt).items():
+            quest[name] = quest.get(name, 0) + delta
+        self.activity.append({
+            "_id": ObjectId(),
+            "address": address,
+            "action": ACTIVITY_ACTIONS[kind],
+            "token": f"${event['symbol'].upper()}",
+            "amount": amount,
+            "type": kind,
+            "ts": event["ts"],
+        })
+        self.events += 1
+
+class IngestService:
+    """Write-behind queue for trade and launch events.
+
+    Events are acknowledged as soon as they are merged into the pending batch.
+    A background task flushes the batch with one unordered bulk_write per
+    collection when `max_batch` events are pending or `flush_interval` seconds
+    have passed, so a burst of trades from one wallet becomes a single user
+    update. A failed flush keeps the batch and retries only the operations
+    that did not go through, backing off up to `max_retry_delay`; new events
+    queue behind it. Pending events are lost if the process dies before a
+    flush; shutdown drains them.
+    """
+
+    def __init__(self, mongo_service, leaderboard_service, user_defaults, max_batch: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 20000, max_retry_delay: float = 30.0,
+                 on_write=None):
+        self.mongo = mongo_service
+        self.leaderboard = leaderboard_service
+        # address -> default user document, for trades by wallets with no profile yet
+        self.user_defaults = user_defaults
+        # Called with each address after its events are written (cache invalidation)
+        self.on_write = on_write
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retry_delay = max_retry_delay
+        self._pending = _Pending()
+        self._retry = None  # batch whose write failed, retried before anything newer
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def _queued(self) -> int:
+        return self._pending.events + (self._retry.events if self._retry else 0)
+
+    def submit(self, event: dict):
+        if self._queued() >= self.max_pending:
+            # Mongo is not keeping up; shed load instead of growing without bound
+            self.rejected += 1
+            raise UpstreamOverloaded("ingest", max(1, math.ceil(self.flush_interval)))
+        event.setdefault("ts", datetime.datetime.utcnow())
+        self._pending.add(event)
+        self.accepted += 1
+        if self._pending.events >= self.max_batch:
+            self._wakeup.set()
+
+    def _retry_delay(self) -> float:
+        return min(self.max_retry_delay, self.flush_interval * 2 ** self._retry.attempts)
+
+    async def _run(self):
+        while not self._stopping:
+            if self._retry is not None:
+                # Back off; a full batch must not hurry a retry against a failing database
+                await asyncio.sleep(self._retry_delay())
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write the failed batch if there is one, else the pending batch. False if the write failed."""
+        async with self._flush_lock:
+            if self._retry is not None:
+                batch = self._retry
+            else:
+                batch, self._pending = self._pending, _Pending()
+                if not batch.events:
+                    return True
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                batch.attempts += 1
+                self.retries += 1
+                self._retry = batch
+                print(f"Ingest flush of {batch.events} events failed (attempt {batch.attempts}), will retry: {e}")
+                return False
+            self._retry = None
+            self.flushes += 1
+            self.flushed += batch.events
+            self.last_flush_seconds = time.perf_counter() - start
+            for address, inc in batch.user_inc.items():
+                for metric, field in (("tokens", "tokensCreated"), ("volume", "volumeApt")):
+                    if field in inc:
+                        self.leaderboard.add(metric, address, inc[field])
+                if self.on_write:
+                    self.on_write(address)
+            return True
+
+    def _build_ops(self, batch: _Pending) -> dict:
+        now = datetime.datetime.utcnow()
+        user_ops = []
+        for address, inc in batch.user_inc.items():
+            maxes = batch.user_max.get(address, {})
+            # $setOnInsert may not touch the fields being incremented
+            defaults = {k: v for k, v in self.user_defaults(address).items() if k not in inc and k not in maxes}
+            update = {"$inc": inc, "$setOnInsert": defaults}
+            if maxes:
+                update["$max"] = maxes
+            if address in batch.traded:
+                update["$addToSet"] = {"tradedTokens": {"$each": sorted(batch.traded[address])}}
+            user_ops.append(UpdateOne({"address": address}, update, upsert=True))
+        quest_ops = [
+            UpdateOne({"_id": address}, counter_update(inc, now), upsert=True)
+            for address, inc in batch.quest_inc.items()
+        ]
+        return {
+            "users": user_ops,
+            "quest_counters": quest_ops,
+            "activity": [InsertOne(row) for row in batch.activity],
+            "tokens": [InsertOne(token) for token in batch.tokens],
+        }
+
+    async def _write(self, batch: _Pending):
+        # Each attempt writes only what earlier attempts did not. The driver's
+        # retryable writes cover a single dropped connection; an $inc whose
+        # outcome is still unknown after that is retried (at least once).
+        if batch.ops is None:
+            batch.ops = self._build_ops(batch)
+        collections = [name for name, ops in batch.ops.items() if ops]
+        results = await asyncio.gather(
+            *(self.mongo.bulk_write(name, batch.ops[name]) for name in collections), return_exceptions=True
+        )
+        error = None
+        for name, result in zip(collections, results):
+            if isinstance(result, BulkWriteError):
+                # Unordered: everything not listed in writeErrors was applied
+                failed = {
+                    e["index"] for e in result.details.get("writeErrors", [])
+                    if not (name in INSERT_COLLECTIONS and e.get("code") == DUPLICATE_KEY)
+                }
+                batch.ops[name] = [op for i, op in enumerate(batch.ops[name]) if i in failed]
+                if failed:
+                    error = error or result
+            elif isinstance(result, Exception):
+                error = error or result
+            else:
+                batch.ops[name] = []
+        if error is not None:
+            raise error
+
+    async def drain(self, attempts: int = 3):
+        # Let an in-progress flush finish rather than cancelling it mid-write
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        failures = 0
+        while self._retry is not None or self._pending.events:
+            if await self.flush():
+                continue
+            failures += 1
+            if failures >= attempts:
+                self.failed += self._queued()
+                print(f"Ingest drain gave up; {self._queued()} events were not written")
+                return
+            await asyncio.sleep(self._retry_delay())
+
+    def stats(self) -> dict:
+        return {
+            "pending_events": self._pending.events,
+            "pending_addresses": len(self._pending.user_inc),
+            "retry_events": self._retry.events if self._retry else 0,
+            "max_batch": self.max_batch,
+            "flush_interval": self.flush_interval,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "retries": self.retries,
+            "failed": self.failed,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
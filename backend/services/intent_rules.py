@@ -0,0 +1,102 @@
+import re
+
+# Local classifier for the imperative trade commands that make up most /chat
+# traffic. Anything it cannot resolve with confidence goes to Gemini.
+
+_TOKEN = r"\$?(?P<token>[A-Za-z][A-Za-z0-9]{1,19})"
+# 1000 / 1,000 / 1.5; a comma only groups thousands, so "1,5" goes to Gemini
+_AMOUNT = r"(?P<amount>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*(?P<scale>[kmb])?"
+_POLITE = r"(?:(?:please|pls|can you|could you|i want to|i'd like to)\s+)?"
+_END = r"\s*[.!]*\s*$"
+_SUPPLY = rf"(?:\s+with\s+(?:a\s+)?(?:total\s+)?supply\s+(?:of\s+)?{_AMOUNT})?"
+
+_MULTIPLIERS = {None: 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+
+# Words that look like tokens in "buy X" but are never symbols; APT is what
+# trades are paid in, so "buy 10 APT" is not a trade of an APT token
+_STOPWORDS = {"a", "an", "the", "some", "me", "it", "token", "tokens", "coin", "coins", "more", "all", "what", "how", "why",
+              "apt"}
+
+# (intent, pattern, confidence); confidence drops when a parameter has to be guessed
+_RULES = [
+    # buy 10 DOGE / sell 1.5k $PEPE / buy 10 of DOGE
+    ("trade", re.compile(rf"^{_POLITE}(?P<verb>buy|sell)\s+{_AMOUNT}\s+(?:of\s+)?{_TOKEN}{_END}", re.I), 1.0),
+    # buy DOGE with 10 APT / sell PEPE for 20 apt
+    ("trade", re.compile(rf"^{_POLITE}(?P<verb>buy|sell)\s+{_TOKEN}\s+(?:with|for)\s+{_AMOUNT}\s*(?P<currency>apt){_END}", re.I), 1.0),
+    # buy 10 APT of DOGE / buy 10 APT worth of DOGE
+    ("trade", re.compile(rf"^{_POLITE}(?P<verb>buy)\s+{_AMOUNT}\s*(?P<currency>apt)\s+(?:worth\s+)?of\s+{_TOKEN}{_END}", re.I), 1.0),
+    # buy DOGE (no amount: the wallet will ask)
+    ("trade", re.compile(rf"^{_POLITE}(?P<verb>buy|sell)\s+{_TOKEN}{_END}", re.I), 0.8),
+    # launch $ROCKET / launch a token called ROCKET with supply 1m: the noun,
+    # name or $ marks the word as a token
+    ("launch", re.compile(
+        rf"^{_POLITE}(?P<verb>launch|create|deploy)\s+(?:a\s+)?(?:new\s+)?"
+        rf"(?:(?:meme\s*)?(?:token|coin)\s+(?:(?:called|named)\s+)?|(?:called|named)\s+|(?=\$)){_TOKEN}"
+        rf"{_SUPPLY}{_END}", re.I), 1.0),
+    # launch ROCKET / create account / deploy contract: could be anything, ask Gemini
+    ("launch", re.compile(
+        rf"^{_POLITE}(?P<verb>launch|create|deploy)\s+(?:a\s+)?(?:new\s+)?{_TOKEN}{_SUPPLY}{_END}", re.I), 0.8),
+]
+
+def _parse_amount(amount: str, scale: str):
+    value = float(amount.replace(",", "")) * _MULTIPLIERS[scale.lower() if scale else None]
+    return int(value) if value.is_integer() else value
+
+class IntentClassifier:
+    def __init__(self, enabled: bool = True, min_confidence: float = 0.9):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.fallbacks = 0
+
+    def match(self, prompt: str):
+        """Return (result, confidence) for the first matching rule, or None."""
+        text = prompt.strip()
+        for kind, pattern, confidence in _RULES:
+            m = pattern.match(text)
+            if not m:
+                continue
+            groups = m.groupdict()
+            token = groups["token"]
+            if token.lower() in _STOPWORDS:
+                return None
+            intent = groups["verb"].lower() if kind == "trade" else "launch"
+            entities = {"token": token.upper()}
+            if groups.get("amount"):
+                key = "supply" if kind == "launch" else "amount"
+                entities[key] = _parse_amount(groups["amount"], groups.get("scale"))
+                if not entities[key]:
+                    return None
+            if groups.get("currency"):
+                entities["currency"] = groups["currency"].upper()
+            return {"intent": intent, "entities": entities, "raw": prompt}, confidence
+        return None
+
+    def resolves(self, prompt: str) -> bool:
+        """Whether classify() would answer locally; does not touch the counters."""
+        if not self.enabled:
+            return False
+        matched = self.match(prompt)
+        return matched is not None and matched[1] >= self.min_confidence
+
+    def classify(self, prompt: str):
+        """Resolve the prompt locally, or return None to fall back to the LLM."""
+        if not self.enabled:
+            return None
+        matched = self.match(prompt)
+        if matched is None or matched[1] < self.min_confidence:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        result, confidence = matched
+        return result | {"source": "rules", "confidence": confidence}
+
+    def stats(self) -> dict:
+        total = self.hits + self.fallbacks
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,160 @@
+import random
+
+# metric name exposed by /leaderboard -> numeric field on the user document
+LEADERBOARD_METRICS = {"xp": "xp", "tokens": "tokensCreated", "volume": "volumeApt"}
+
+class _Node:
+    __slots__ = ("key", "priority", "size", "left", "right")
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+def _size(node):
+    return node.size if node else 0
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+def _split(node, key):
+    # -> (keys < key, keys >= key)
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.priority > b.priority:
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    b.left = _merge(a, b.left)
+    _update(b)
+    return b
+
+def _remove(node, key):
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+class OrderStatisticTree:
+    """Treap with subtree sizes: insert, remove, rank and select in O(log n)."""
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return _size(self.root)
+
+    def insert(self, key):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        self.root = _remove(self.root, key)
+
+    def rank(self, key) -> int:
+        # Number of keys strictly smaller than key
+        count, node = 0, self.root
+        while node:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def select(self, index: int):
+        node = self.root
+        while node:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+class LeaderboardService:
+    """Per-metric rankings kept in memory, rebuilt from Mongo at startup.
+
+    Each worker holds its own copy; updates made through this service are
+    applied incrementally, so rank lookups never scan the users collection.
+    """
+
+    def __init__(self, mongo_service):
+        self.mongo = mongo_service
+        self.trees = {metric: OrderStatisticTree() for metric in LEADERBOARD_METRICS}
+        # metric -> address -> current score
+        self.scores = {metric: {} for metric in LEADERBOARD_METRICS}
+
+    async def rebuild(self):
+        self.trees = {metric: OrderStatisticTree() for metric in LEADERBOARD_METRICS}
+        self.scores = {metric: {} for metric in LEADERBOARD_METRICS}
+        count = 0
+        async for user in self.mongo.iter_users(["address", *LEADERBOARD_METRICS.values()]):
+            self.track(user)
+            count += 1
+        print(f"Leaderboard rebuilt from {count} users")
+
+    def update(self, metric: str, address: str, value):
+        scores = self.scores[metric]
+        value = float(value or 0)
+        old = scores.get(address)
+        if old == value:
+            return
+        tree = self.trees[metric]
+        if old is not None:
+            tree.remove((-old, address))
+        # Highest score first; ties broken by address for a stable order
+        tree.insert((-value, address))
+        scores[address] = value
+
+    def add(self, metric: str, address: str, delta):
+        self.update(metric, address, self.scores[metric].get(address, 0) + float(delta))
+
+    def track(self, user: dict):
+        for metric, field in LEADERBOARD_METRICS.items():
+            self.update(metric, user["address"], user.get(field, 0))
+
+    def rank(self, address: str, metric: str = "xp") -> int:
+        # 1-based rank, 0 when the address is not ranked yet
+        score = self.scores[metric].get(address)
+        if score is None:
+            return 0
+        return self.trees[metric].rank((-score, address)) + 1
+
+    def page(self, metric: str, offset: int = 0, limit: int = 20) -> list:
+        tree = self.trees[metric]
+        end = min(len(tree), offset + limit)
+        entries = []
+        for i in range(offset, end):
+            score, address = tree.select(i)
+            entries.append({"rank": i + 1, "address": address, "value": -score})
+        return entries
+
+    def total(self, metric: str) -> int:
+        return len(self.trees[metric])
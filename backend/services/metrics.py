@@ -0,0 +1,181 @@
+from contextlib import asynccontextmanager
+import bisect
+import threading
+import time
+from pymongo import monitoring
+
+# Minimal Prometheus text-format registry. Metrics are updated from the event
+# loop and from driver threads (Mongo command listener), so each one locks.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket counts (non-cumulative), sum, count
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            inf = 'le="+Inf"'
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = f'le="{_format_value(float(bound))}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, inf)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "promptfun_http_request_duration_seconds", "Time to produce a response, per route.", ["method", "route", "status"])
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "promptfun_http_requests_in_flight", "Requests currently being handled.")
+HTTP_ERRORS = REGISTRY.counter(
+    "promptfun_http_errors_total", "Unhandled exceptions raised by route handlers.", ["route", "error"])
+UPSTREAM_DURATION = REGISTRY.histogram(
+    "promptfun_upstream_duration_seconds", "Latency of calls to Gemini, the RAG server and MongoDB.", ["upstream", "operation"])
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "promptfun_upstream_in_flight", "Upstream calls currently in flight.", ["upstream"])
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "promptfun_upstream_errors_total", "Failed upstream calls by error type.", ["upstream", "operation", "error"])
+
+@asynccontextmanager
+async def track_upstream(upstream: str, operation: str):
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        UPSTREAM_ERRORS.inc(upstream=upstream, operation=operation, error=type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - start, upstream=upstream, operation=operation)
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command (find, update, insert, ...) at the driver level."""
+
+    def started(self, event):
+        UPSTREAM_IN_FLIGHT.inc(upstream="mongo")
+
+    def succeeded(self, event):
+        UPSTREAM_IN_FLIGHT.dec(upstream="mongo")
+        UPSTREAM_DURATION.observe(event.duration_micros / 1e6, upstream="mongo", operation=event.command_name)
+
+    def failed(self, event):
+        UPSTREAM_IN_FLIGHT.dec(upstream="mongo")
+        UPSTREAM_DURATION.observe(event.duration_micros / 1e6, upstream="mongo", operation=event.command_name)
+        error = (event.failure or {}).get("codeName", "CommandFailed")
+        UPSTREAM_ERRORS.inc(upstream="mongo", operation=event.command_name, error=error)
+
+def render_stats(prefix: str, stats: dict, counters=()) -> str:
+    # Export a service's stats() dict; keys in `counters` become *_total counters
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        kind = "counter" if key in counters else "gauge"
+        name = f"promptfun_{prefix}_{key}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
@@ -1,16 +1,109 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from services.metrics import MongoCommandMetrics
+import datetime
+import os
+
 class MongoService:
-    def __init__(self, client):
-        self.client = client
-        self.db = client.get_database()
+    def __init__(self, uri: str = None, db_name: str = None):
+        self.uri = uri or os.getenv("MONGO_URI", "mongodb://localhost:27017")
+        # Motor runs every operation without blocking the event loop; the pool
+        # bounds how many Mongo round trips a worker keeps in flight at once.
+        self.client = AsyncIOMotorClient(
+            self.uri,
+            maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+            serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            event_listeners=[MongoCommandMetrics()],
+        )
+        self.db = self.client[db_name or os.getenv("MONGO_DB", "promptfun")]
+
+    async def ensure_indexes(self):
+        try:
+            await self.db.users.create_index("address", unique=True)
+        except OperationFailure as e:
+            # Existing duplicates (or an older non-unique index) must be cleaned up by hand
+            print(f"Could not create unique index on users.address: {e}")
+        # Serves newest-first feeds and keyset pages on (ts, _id) without a sort stage
+        await self.db.activity.create_index([("address", 1), ("ts", -1), ("_id", -1)])
+        await self.db.tokens.create_index("symbol")
+
+    def close(self):
+        self.client.close()
+
+    # --- Users ---
+    async def get_user(self, address: str, projection: dict = None) -> dict:
+        return await self.db.users.find_one({"address": address}, projection)
+
+    async def get_or_create_user(self, address: str, defaults: dict, projection: dict = None) -> dict:
+        # Single round trip: returns the existing user or inserts the defaults atomically
+        query = {"address": address}
+        update = {"$setOnInsert": defaults}
+        try:
+            return await self.db.users.find_one_and_update(
+                query, update, projection=projection, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race against the unique index; the document exists now
+            return await self.db.users.find_one(query, projection)
+
+    def iter_users(self, fields: list):
+        # Async cursor over every user, projected to the given fields
+        return self.db.users.find({}, {"_id": 0, **{f: 1 for f in fields}})
+
+    async def update_user_fields(self, address: str, fields: dict):
+        await self.db.users.update_one({"address": address}, {"$set": fields})
+
+    async def update_xp(self, address: str, xp: int) -> bool:
+        result = await self.db.users.update_one({"address": address}, {"$set": {"xp": xp}})
+        return result.matched_count > 0
+
+    async def bulk_write(self, collection: str, operations: list):
+        # Unordered so one failed operation does not stop the rest of the batch
+        if operations:
+            await self.db[collection].bulk_write(operations, ordered=False)
+
+    # --- Chat sessions ---
+    async def ensure_chat_session_indexes(self, ttl_seconds: int):
+        await self.db.chat_sessions.create_index("updatedAt", expireAfterSeconds=ttl_seconds)
+
+    async def get_chat_session(self, session_id: str) -> dict:
+        doc = await self.db.chat_sessions.find_one({"_id": session_id})
+        if doc is not None:
+            doc["id"] = doc.pop("_id")
+        return doc
+
+    async def save_chat_session(self, session: dict):
+        doc = {k: v for k, v in session.items() if k != "id"}
+        await self.db.chat_sessions.replace_one({"_id": session["id"]}, doc, upsert=True)
+
+    # --- Rate limits (shared token buckets) ---
+    async def ensure_rate_limit_indexes(self):
+        await self.db.rate_limits.create_index("expiresAt", expireAfterSeconds=0)
+
+    async def update_rate_limit(self, key: str, pipeline: list) -> dict:
+        return await self.db.rate_limits.find_one_and_update(
+            {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+        )
 
-    def get_user(self, user_id: str) -> dict:
-        # TODO: Fetch user from MongoDB
-        return {"user_id": user_id, "stub": True}
+    # --- Per-user lists (merged with services/user_templates.py on read) ---
+    async def get_quest_counters(self, address: str) -> dict:
+        return await self.db.quest_counters.find_one({"_id": address})
 
-    def save_token(self, token_data: dict) -> str:
-        # TODO: Save token to MongoDB
-        return "token_id_stub"
+    async def update_quest_counters(self, address: str, pipeline: list):
+        await self.db.quest_counters.update_one({"_id": address}, pipeline, upsert=True)
 
-    def update_xp(self, user_id: str, xp: int) -> bool:
-        # TODO: Update XP in MongoDB
-        return True 
\ No newline at end of file
+    async def get_activity(self, address: str, before: datetime.datetime = None, before_id: ObjectId = None,
+                           limit: int = 20) -> list:
+        # Newest first; pass the last row's ts and id as `before`/`before_id` for
+        # the next page. ts alone is not unique (a burst of trades shares one), so
+        # ties are broken by _id.
+        query = {"address": address}
+        if before is not None and before_id is not None:
+            query["$or"] = [{"ts": {"$lt": before}}, {"ts": before, "_id": {"$lt": before_id}}]
+        elif before is not None:
+            query["ts"] = {"$lt": before}
+        cursor = self.db.activity.find(query, {"address": 0}).sort([("ts", -1), ("_id", -1)]).limit(limit)
+        rows = await cursor.to_list(length=limit)
+        return [{**{k: v for k, v in row.items() if k != "_id"}, "id": str(row["_id"])} for row in rows]
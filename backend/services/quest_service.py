@@ -0,0 +1,89 @@
+import datetime
+from services.user_templates import QUEST_TEMPLATES
+
+# Quest progress is kept as running counters per user, one bucket per window
+# (day / week / month, UTC). Each event updates every bucket in one atomic
+# pipeline update that also rolls a bucket over when its window has ended, so
+# reading a user's quests is a single document lookup with no history scan.
+
+QUEST_COUNTERS = ("trades", "volumeApt", "launches", "shares")
+QUEST_WINDOWS = ("day", "week", "month")
+
+def event_increments(event: str, amount_apt: float = 0) -> dict:
+    if event in ("buy", "sell", "trade"):
+        return {"trades": 1, "volumeApt": amount_apt}
+    if event == "launch":
+        return {"launches": 1}
+    if event == "share":
+        return {"shares": 1}
+    raise ValueError(f"Unknown quest event '{event}'")
+
+def window_bounds(window: str, now: datetime.datetime):
+    # -> (window id, end of window)
+    day = datetime.datetime(now.year, now.month, now.day)
+    if window == "day":
+        return day.strftime("%Y-%m-%d"), day + datetime.timedelta(days=1)
+    if window == "week":
+        year, week, weekday = now.isocalendar()
+        return f"{year}-W{week:02d}", day + datetime.timedelta(days=8 - weekday)
+    if window == "month":
+        end = datetime.datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+        return now.strftime("%Y-%m"), end
+    raise ValueError(f"Unknown quest window '{window}'")
+
+def format_time_left(delta: datetime.timedelta) -> str:
+    seconds = max(0, int(delta.total_seconds()))
+    if seconds >= 86400:
+        return f"{seconds // 86400}d"
+    if seconds >= 3600:
+        return f"{seconds // 3600}h"
+    return f"{max(1, seconds // 60)}m"
+
+def counter_update(increments: dict, now: datetime.datetime) -> list:
+    """Update pipeline adding `increments` to every window bucket.
+
+    A bucket whose stored window id is not the current one starts again from
+    zero, so counters roll over on the first event of a new day/week/month.
+    """
+    counters = {}
+    windows = {}
+    for window in QUEST_WINDOWS:
+        window_id, _ = window_bounds(window, now)
+        current = {"$eq": [f"${window}.window", window_id]}
+        for name in QUEST_COUNTERS:
+            kept = {"$cond": [current, {"$ifNull": [f"${window}.{name}", 0]}, 0]}
+            counters[f"{window}.{name}"] = {"$add": [kept, increments.get(name, 0)]}
+        windows[f"{window}.window"] = window_id
+    # Window ids are written in a second stage so the comparison above sees the stored ones
+    return [{"$set": counters}, {"$set": windows}]
+
+class QuestService:
+    def __init__(self, mongo_service):
+        self.mongo = mongo_service
+
+    async def record(self, address: str, event: str, amount_apt: float = 0):
+        await self.record_increments(address, event_increments(event, amount_apt))
+
+    async def record_increments(self, address: str, increments: dict):
+        now = datetime.datetime.utcnow()
+        await self.mongo.update_quest_counters(address, counter_update(increments, now))
+
+    async def get_quests(self, address: str) -> list:
+        doc = await self.mongo.get_quest_counters(address) or {}
+        now = datetime.datetime.utcnow()
+        quests = []
+        for template in QUEST_TEMPLATES:
+            window = template["window"]
+            window_id, end = window_bounds(window, now)
+            bucket = doc.get(window) or {}
+            # A bucket left over from an earlier window counts as zero until the next event resets it
+            value = bucket.get(template["counter"], 0) if bucket.get("window") == window_id else 0
+            quests.append({
+                "title": template["title"],
+                "description": template["description"],
+                "progress": min(template["total"], int(value)),
+                "total": template["total"],
+                "reward": template["reward"],
+                "timeLeft": format_time_left(end - now),
+            })
+        return quests
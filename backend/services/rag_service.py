@@ -1,21 +1,96 @@
+import asyncio
 import httpx
 import os
+from services.metrics import track_upstream
+from services.resilience import CircuitOpen, ResilientUpstream
+
+# Served while the circuit is open instead of waiting on a dead upstream
+RAG_FALLBACK = {"answer": "The knowledge base is temporarily unavailable. Please try again in a moment.", "fallback": True}
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
 
 class RagService:
     def __init__(self, rag_url: str = None):
         self.base_url = rag_url or os.getenv("RAG_SERVER_URL", "http://localhost:8000")
+        self.timeout = float(os.getenv("RAG_TIMEOUT", "20"))
+        # RAG_TIMEOUT caps the adaptive per-call deadline; queries are reads, so hedging is safe
+        self.resilience = ResilientUpstream.from_env("rag", max_timeout=self.timeout, hedge=_env_flag("RAG_HEDGE"))
+        self.http2 = _env_flag("RAG_HTTP2")
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("RAG_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("RAG_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("RAG_KEEPALIVE_EXPIRY", "30")),
+        )
+        self._client = None
+        # (question, top_k) -> {"task", "waiters"} for the upstream call in flight
+        self._inflight = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # One client for the app lifetime so connections are pooled and kept alive
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._client
+
+    async def warmup(self):
+        # Opens a pooled keep-alive connection so the first /ask skips the handshake
+        root = self.base_url.rstrip("/").removesuffix("/query")
+        async with track_upstream("rag", "warmup"):
+            resp = await self._get_client().get(root + "/health")
+            resp.raise_for_status()
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 
     async def ask(self, question: str, top_k: int = 1) -> dict:
+        # Identical questions already in flight share a single upstream call
+        key = (question.strip(), top_k)
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._query(question, top_k))
+            entry = self._inflight[key] = {"task": task, "waiters": 0}
+            task.add_done_callback(lambda t: self._forget(key, t))
+        task = entry["task"]
+        entry["waiters"] += 1
+        try:
+            # Shield so one caller going away does not cancel the call for the others
+            result = await asyncio.shield(task)
+        except CircuitOpen:
+            self.resilience.fallbacks += 1
+            return dict(RAG_FALLBACK)
+        finally:
+            entry["waiters"] -= 1
+            # The last caller to leave cancels the upstream call it no longer needs
+            if entry["waiters"] == 0 and not task.done():
+                task.cancel()
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+        return dict(result)
+
+    def _forget(self, key, task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry["task"] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled
+            task.exception()
+
+    async def _query(self, question: str, top_k: int) -> dict:
         # Always call /query endpoint, even if base_url does not end with /query
         url = self.base_url.rstrip("/") + "/query"
         data = {"question": question, "top_k": top_k}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=data, timeout=20)
-            resp.raise_for_status()
-            result = resp.json()
+
+        async def attempt():
+            async with track_upstream("rag", "query"):
+                resp = await self._get_client().post(url, json=data)
+                resp.raise_for_status()
+                return resp.json()
+        result = await self.resilience.call("query", attempt, hedge=True)
         # Return the top answer and the full raw response
         if "results" in result and result["results"]:
             answer = result["results"][0]["text"]
         else:
             answer = "No answer found."
-        return {"answer": answer, "raw_rag": result} 
\ No newline at end of file
+        return {"answer": answer, "raw_rag": result}
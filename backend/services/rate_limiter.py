@@ -0,0 +1,147 @@
+from collections import OrderedDict
+import datetime
+import math
+import os
+import time
+from services.metrics import REGISTRY
+
+RATE_LIMIT_DECISIONS = REGISTRY.counter(
+    "promptfun_rate_limit_decisions_total", "Rate limiter decisions per route class.", ["route_class", "decision"])
+
+# Route class -> default (requests per minute, burst)
+DEFAULT_LIMITS = {
+    "chat": (30, 10),
+    "parse": (60, 20),
+    "ask": (30, 10),
+}
+
+class RateLimited(Exception):
+    """The caller's bucket for a route class is empty; answered with 429."""
+
+    def __init__(self, route_class: str, retry_after: int):
+        super().__init__(f"Too many {route_class} requests, retry in {retry_after}s")
+        self.route_class = route_class
+        self.retry_after = retry_after
+
+class InMemoryBucketStore:
+    """Token buckets for this worker only; each worker admits its own share."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+
+    async def ensure_indexes(self):
+        pass
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> float:
+        """Take `cost` tokens if available. Returns the tokens left, negative when refused."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        left = tokens - cost
+        self._buckets[key] = (left if left >= 0 else tokens, now)
+        # Least recently used first; an evicted bucket comes back full, which is its likely state anyway
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return left
+
+class MongoBucketStore:
+    """Buckets shared by every worker, refilled and drawn in one atomic update."""
+
+    def __init__(self, mongo_service):
+        self.mongo = mongo_service
+
+    async def ensure_indexes(self):
+        await self.mongo.ensure_rate_limit_indexes()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> float:
+        now = time.time()
+        # Idle buckets are full again after burst / rate seconds and can be dropped
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=burst / rate)
+        pipeline = [
+            {"$set": {"tokens": {"$min": [burst, {"$add": [
+                {"$ifNull": ["$tokens", burst]},
+                {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}, rate]},
+            ]}]}}},
+            {"$set": {"left": {"$subtract": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": [{"$gte": ["$left", 0]}, "$left", "$tokens"]},
+                "updated": now,
+                "expiresAt": {"$literal": expires_at},
+            }},
+        ]
+        doc = await self.mongo.update_rate_limit(key, pipeline)
+        return doc["left"]
+
+class RateLimiter:
+    """Token-bucket admission per caller and route class.
+
+    Each (route class, caller) pair has a bucket holding up to `burst`
+    tokens, refilled at `per_minute` tokens per minute. A request costs one
+    token (a /parse/batch costs one per Gemini request it needs). An empty
+    bucket raises RateLimited with the seconds until enough tokens are back.
+    If the shared store fails, requests are let through.
+    """
+
+    def __init__(self, store, limits: dict, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+        # route class -> (tokens per second, burst)
+        self.limits = {name: (per_minute / 60.0, float(burst)) for name, (per_minute, burst) in limits.items()}
+        self.allowed = {name: 0 for name in limits}
+        self.rejected = {name: 0 for name in limits}
+        self.store_errors = 0
+
+    @classmethod
+    def from_env(cls, store) -> "RateLimiter":
+        # RATE_LIMIT_CHAT_PER_MINUTE / RATE_LIMIT_CHAT_BURST, etc.
+        limits = {
+            name: (
+                float(os.getenv(f"RATE_LIMIT_{name.upper()}_PER_MINUTE", str(per_minute))),
+                float(os.getenv(f"RATE_LIMIT_{name.upper()}_BURST", str(burst))),
+            )
+            for name, (per_minute, burst) in DEFAULT_LIMITS.items()
+        }
+        enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+        return cls(store, limits, enabled)
+
+    async def check(self, route_class: str, callers: list, cost: float = 1):
+        """Charge every bucket in `callers` (e.g. the IP and the wallet) in order.
+
+        The request is admitted only if all of them have tokens; the first
+        empty one rejects it and later buckets are not charged.
+        """
+        if not self.enabled:
+            return
+        rate, burst = self.limits[route_class]
+        # A request bigger than the bucket needs a full one rather than never fitting
+        cost = min(cost, burst)
+        for caller in callers:
+            try:
+                left = await self.store.take(f"{route_class}:{caller}", rate, burst, cost)
+            except Exception as e:
+                self.store_errors += 1
+                print(f"Rate limit store failed, admitting request: {e}")
+                return
+            if left < 0:
+                self.rejected[route_class] += 1
+                RATE_LIMIT_DECISIONS.inc(route_class=route_class, decision="rejected")
+                raise RateLimited(route_class, max(1, math.ceil(-left / rate)))
+        self.allowed[route_class] += 1
+        RATE_LIMIT_DECISIONS.inc(route_class=route_class, decision="allowed")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "store_errors": self.store_errors,
+            "classes": {
+                name: {
+                    "per_minute": rate * 60,
+                    "burst": burst,
+                    "allowed": self.allowed[name],
+                    "rejected": self.rejected[name],
+                }
+                for name, (rate, burst) in self.limits.items()
+            },
+        }
@@ -0,0 +1,253 @@
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import os
+import time
+from services.executor import UpstreamOverloaded
+
+class CircuitOpen(UpstreamOverloaded):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(name, retry_after)
+        self.args = (f"{name} is unavailable (circuit open), retry in {retry_after}s",)
+
+class UpstreamTimeout(Exception):
+    def __init__(self, name: str, operation: str, timeout: float):
+        super().__init__(f"{name} {operation} timed out after {timeout:.1f}s")
+        self.name = name
+        self.operation = operation
+        self.timeout = timeout
+
+class LatencyWindow:
+    """The last `size` latencies of one operation, for percentile lookups."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._sorted = None
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, p: float):
+        # None until there are enough samples to trust the tail
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, max(0, math.ceil(p / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures.
+
+    While open every call is refused. After `reset_timeout` seconds one probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it for another `reset_timeout`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.opened_at + self.reset_timeout - time.monotonic()))
+
+    def success(self):
+        self.consecutive_failures = 0
+        self._probing = False
+        self.state = self.CLOSED
+
+    def failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.opens += 1
+
+    def release(self):
+        # The call ended without saying anything about the upstream (cancelled, shed locally)
+        self._probing = False
+
+class ResilientUpstream:
+    """Circuit breaker, adaptive timeouts and optional hedging for one upstream.
+
+    Timeouts follow the observed p99 of each operation (times
+    `timeout_multiplier`, clamped to [min_timeout, max_timeout]) once enough
+    samples exist; until then `max_timeout` applies. A hedged call sends a
+    second attempt when the first has not answered by the operation's p95 and
+    takes whichever finishes first. Hedges are capped at `hedge_ratio` of
+    calls so a slow upstream is not hit with twice the load. Only hedge calls
+    that are safe to repeat.
+    """
+
+    def __init__(self, name: str, max_timeout: float, min_timeout: float = 1.0, timeout_multiplier: float = 2.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, hedge: bool = False,
+                 hedge_ratio: float = 0.1, window: int = 200, min_samples: int = 20):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge = hedge
+        self.hedge_ratio = hedge_ratio
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._window_size = window
+        self._min_samples = min_samples
+        self._windows = {}  # operation -> LatencyWindow
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, name: str, max_timeout: float, hedge: bool = False) -> "ResilientUpstream":
+        # Breaker and timeout tuning is shared by all upstreams
+        return cls(
+            name,
+            max_timeout=max_timeout,
+            min_timeout=float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "1.0")),
+            timeout_multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0")),
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+            hedge=hedge,
+            hedge_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")),
+        )
+
+    def _window(self, operation: str) -> LatencyWindow:
+        window = self._windows.get(operation)
+        if window is None:
+            window = self._windows[operation] = LatencyWindow(self._window_size, self._min_samples)
+        return window
+
+    def timeout(self, operation: str) -> float:
+        p99 = self._window(operation).percentile(99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    @asynccontextmanager
+    async def guarded(self):
+        """Breaker bookkeeping only, for calls that cannot take a timeout (streams)."""
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpen(self.name, self.breaker.retry_after())
+        self.calls += 1
+        try:
+            yield
+        except UpstreamOverloaded:
+            # Shed by our own pool; says nothing about the upstream's health
+            self.breaker.release()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.success()
+
+    async def call(self, operation: str, attempt, hedge: bool = False):
+        """Await attempt() under the breaker and the operation's adaptive timeout.
+
+        `attempt` is a zero-argument coroutine function; a hedged call may
+        invoke it twice. Raises CircuitOpen without calling it while the
+        circuit is open, and UpstreamTimeout when the deadline passes.
+        """
+        window = self._window(operation)
+        timeout = self.timeout(operation)
+        async with self.guarded():
+            hedged = hedge and self.hedge and self.breaker.state == CircuitBreaker.CLOSED
+            try:
+                return await asyncio.wait_for(
+                    self._hedged(window, attempt) if hedged else self._timed(window, attempt), timeout)
+            except TimeoutError:
+                self.timeouts += 1
+                # Counting the timeout as a sample lets the deadline grow if the
+                # upstream has become slower for good instead of timing out forever
+                window.add(timeout)
+                raise UpstreamTimeout(self.name, operation, timeout) from None
+
+    async def _timed(self, window: LatencyWindow, attempt):
+        start = time.monotonic()
+        result = await attempt()
+        window.add(time.monotonic() - start)
+        return result
+
+    async def _hedged(self, window: LatencyWindow, attempt):
+        delay = window.percentile(95)
+        first = asyncio.ensure_future(self._timed(window, attempt))
+        pending = {first}
+        try:
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+            if first.done() or delay is None or self.hedges >= self.hedge_ratio * self.calls:
+                return await first
+            self.hedges += 1
+            second = asyncio.ensure_future(self._timed(window, attempt))
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing attempt (or both, if the caller gave up) is abandoned
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        operations = {}
+        for operation, window in self._windows.items():
+            p50, p95, p99 = (window.percentile(p) for p in (50, 95, 99))
+            operations[operation] = {
+                "p50_seconds": p50,
+                "p95_seconds": p95,
+                "p99_seconds": p99,
+                "timeout_seconds": self.timeout(operation),
+            }
+        return {
+            "state": self.breaker.state,
+            "open": int(self.breaker.state != CircuitBreaker.CLOSED),
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "opens": self.breaker.opens,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedging": self.hedge,
+            "operations": operations,
+        }
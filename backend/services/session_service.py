@@ -0,0 +1,122 @@
+from collections import OrderedDict
+import datetime
+import uuid
+
+def estimate_tokens(text: str) -> int:
+    # Rough Gemini-style estimate (~4 characters per token); only used for budgeting
+    return len(text) // 4 + 1
+
+def new_session(session_id: str = None) -> dict:
+    return {"id": session_id or uuid.uuid4().hex, "summary": "", "messages": []}
+
+class InMemorySessionStore:
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+
+    async def ensure_indexes(self):
+        pass
+
+    async def get(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def save(self, session: dict):
+        self._sessions[session["id"]] = session
+        self._sessions.move_to_end(session["id"])
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+
+class MongoSessionStore:
+    def __init__(self, mongo_service, ttl_seconds: int = 7 * 24 * 3600):
+        self.mongo = mongo_service
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self):
+        await self.mongo.ensure_chat_session_indexes(self.ttl_seconds)
+
+    async def get(self, session_id: str):
+        return await self.mongo.get_chat_session(session_id)
+
+    async def save(self, session: dict):
+        await self.mongo.save_chat_session(session)
+
+class SessionService:
+    """Server-side chat history: a token-budgeted window of recent turns plus
+    a summary of everything older, compacted by the LLM in the background."""
+
+    def __init__(self, store, gemini_service, token_budget: int = 2000, compact_min_messages: int = 6):
+        self.store = store
+        self.gemini = gemini_service
+        self.token_budget = token_budget
+        self.compact_min_messages = compact_min_messages
+        self._compacting = set()  # session ids with a compaction in flight
+
+    async def load(self, session_id: str) -> dict:
+        return await self.store.get(session_id) or new_session(session_id)
+
+    def split(self, session: dict):
+        # -> (older messages outside the budget, newest messages that fit)
+        messages = session["messages"]
+        used = estimate_tokens(session["summary"]) if session["summary"] else 0
+        start = len(messages)
+        while start > 0:
+            cost = estimate_tokens(messages[start - 1]["content"])
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            start -= 1
+        # Cut on a turn boundary: a reply whose question is in the overflow goes with it
+        while start < len(messages) and messages[start]["role"] != "user":
+            start += 1
+        return messages[:start], messages[start:]
+
+    def prompt_history(self, session: dict) -> list:
+        _, window = self.split(session)
+        if session["summary"]:
+            return [{"role": "summary", "content": session["summary"]}] + window
+        return window
+
+    async def record_turn(self, session: dict, user_message: str, assistant_reply: str) -> bool:
+        """Append a turn and save. Returns True when older turns should be compacted."""
+        session["messages"].append({"role": "user", "content": user_message})
+        session["messages"].append({"role": "assistant", "content": assistant_reply})
+        session["updatedAt"] = datetime.datetime.utcnow()
+        await self.store.save(session)
+        overflow, _ = self.split(session)
+        return len(overflow) >= self.compact_min_messages
+
+    async def compact(self, session_id: str):
+        # Every turn past the budget schedules a compaction; one per session runs at a time
+        if session_id in self._compacting:
+            return
+        self._compacting.add(session_id)
+        try:
+            await self._compact(session_id)
+        finally:
+            self._compacting.discard(session_id)
+
+    async def _compact(self, session_id: str):
+        session = await self.store.get(session_id)
+        if session is None:
+            return
+        overflow, _ = self.split(session)
+        if len(overflow) < self.compact_min_messages:
+            return
+        overflow = list(overflow)
+        summary_before = session["summary"]
+        try:
+            summary = await self.gemini.summarize(summary_before, overflow)
+        except Exception as e:
+            print(f"Session compaction failed for {session_id}: {e}")
+            return
+        # Re-read so turns recorded while the summary was generated are kept
+        session = await self.store.get(session_id) or session
+        if session["summary"] != summary_before or session["messages"][:len(overflow)] != overflow:
+            # Compacted elsewhere meanwhile (another worker); trimming now would drop unsummarized turns
+            return
+        session["summary"] = summary
+        session["messages"] = session["messages"][len(overflow):]
+        await self.store.save(session)
@@ -0,0 +1,44 @@
+import datetime
+
+# Shared defaults for the /user/* lists. Nothing here is copied into Mongo per
+# user: reads merge the template with whatever sparse state the user has.
+
+# Progress comes from the windowed counters in services/quest_service.py:
+# `counter` is the counter read, `window` the period it is counted over.
+QUEST_TEMPLATES = [
+    {"title": "Daily Trader", "description": "Make 5 trades today", "total": 5, "reward": "50 XP", "counter": "trades", "window": "day"},
+    {"title": "Token Creator", "description": "Launch 3 tokens this week", "total": 3, "reward": "200 XP", "counter": "launches", "window": "week"},
+    {"title": "Volume King", "description": "Trade 100 APT this month", "total": 100, "reward": "500 XP", "counter": "volumeApt", "window": "month"},
+    {"title": "Social Butterfly", "description": "Share 3 tokens on social", "total": 3, "reward": "100 XP", "counter": "shares", "window": "week"},
+]
+
+# "age" is seconds before the request; sample rows get a ts relative to now
+ACTIVITY_TEMPLATES = [
+    {"action": "Launched", "token": "$ROCKET", "amount": "1000 tokens", "age": 2 * 3600, "type": "launch"},
+    {"action": "Bought", "token": "$DOGE", "amount": "500 APT", "age": 5 * 3600, "type": "buy"},
+    {"action": "Sold", "token": "$PEPE", "amount": "1.2K tokens", "age": 24 * 3600, "type": "sell"},
+    {"action": "Launched", "token": "$MOON", "amount": "2000 tokens", "age": 3 * 24 * 3600, "type": "launch"},
+    {"action": "Bought", "token": "$CYBER", "amount": "250 APT", "age": 7 * 24 * 3600, "type": "buy"},
+]
+
+TIME_UNITS = [("year", 365 * 86400), ("month", 30 * 86400), ("week", 7 * 86400), ("day", 86400), ("hour", 3600), ("minute", 60)]
+
+def relative_time(ts: datetime.datetime, now: datetime.datetime) -> str:
+    seconds = (now - ts).total_seconds()
+    for unit, size in TIME_UNITS:
+        if seconds >= size:
+            n = int(seconds // size)
+            return f"{n} {unit}{'s' if n > 1 else ''} ago"
+    return "just now"
+
+def merge_activity(stored: list, first_page: bool = True) -> list:
+    # stored: newest-first rows with a UTC "ts". Users with no recorded activity
+    # see the sample feed on the first page; it is never persisted.
+    now = datetime.datetime.utcnow()
+    if not stored and first_page:
+        stored = [
+            {**{k: v for k, v in a.items() if k != "age"}, "ts": now - datetime.timedelta(seconds=a["age"])}
+            for a in ACTIVITY_TEMPLATES
+        ]
+    # Rows written before timestamps were stored keep their original "time" text
+    return [{**a, "time": relative_time(a["ts"], now)} if a.get("ts") else a for a in stored]
@@ -0,0 +1,69 @@
+import asyncio
+import random
+import time
+
+class Warmup:
+    """Startup steps that need the network, run in the background with retries.
+
+    Each step retries with capped exponential backoff until it succeeds.
+    Required steps gate readiness (/health/ready). Optional steps (e.g.
+    pre-opening upstream pools) give up after `optional_attempts`, and a
+    failure there is only reported. The worker serves liveness immediately
+    either way.
+    """
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 30.0, optional_attempts: int = 5):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.optional_attempts = optional_attempts
+        self._steps = []  # (name, fn, required)
+        self._tasks = []
+        self.state = {}
+        self.started_at = time.monotonic()
+
+    def add(self, name: str, fn, required: bool = True):
+        self._steps.append((name, fn, required))
+        self.state[name] = {"status": "pending", "required": required, "attempts": 0, "error": None, "seconds": None}
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run_step(name, fn, required)) for name, fn, required in self._steps]
+
+    async def wait(self):
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.wait()
+
+    async def _run_step(self, name: str, fn, required: bool):
+        state = self.state[name]
+        delay = self.base_delay
+        while True:
+            state["attempts"] += 1
+            try:
+                await fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                state["error"] = f"{type(e).__name__}: {e}"
+                if not required and state["attempts"] >= self.optional_attempts:
+                    state["status"] = "failed"
+                    print(f"Warmup step {name} gave up after {state['attempts']} attempts: {e}")
+                    return
+                print(f"Warmup step {name} failed (attempt {state['attempts']}), retrying in {delay:.1f}s: {e}")
+                # Jitter keeps a fleet of restarting workers from retrying in lockstep
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(self.max_delay, delay * 2)
+                continue
+            state["status"] = "ready"
+            state["error"] = None
+            state["seconds"] = round(time.monotonic() - self.started_at, 3)
+            return
+
+    def ready(self) -> bool:
+        return all(s["status"] == "ready" for s in self.state.values() if s["required"])
+
+    def stats(self) -> dict:
+        return {"ready": self.ready(), "steps": self.state}
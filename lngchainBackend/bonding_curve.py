@@ -0,0 +1,45 @@
+import numpy as np
+
+# Quotes for the on-chain curve in build/prompt_fun/sources/BondingCurve.move,
+# computed for many tokens/amounts at once with NumPy instead of a Python loop.
+#
+#   buy_token:  payment required = base_price * (supply + amount)
+#   sell_token: refund           = base_price * amount
+#
+# The spot price is what buying a single token costs right now,
+# base_price * (supply + 1); market cap is supply * spot price. Slippage is
+# the move in spot price the trade causes (positive for buys, negative for
+# sells), since the contract's payment is not a per-token integral.
+
+def quote_arrays(supply, base_price, amount, is_buy) -> dict:
+    """Vectorized quotes; every argument is a scalar or a same-length array."""
+    supply = np.asarray(supply, dtype=np.float64)
+    base_price = np.asarray(base_price, dtype=np.float64)
+    amount = np.asarray(amount, dtype=np.float64)
+    is_buy = np.asarray(is_buy, dtype=bool)
+    supply, base_price, amount, is_buy = np.broadcast_arrays(supply, base_price, amount, is_buy)
+
+    price = base_price * (supply + 1)
+    total = np.where(is_buy, base_price * (supply + amount), base_price * amount)
+    new_supply = np.where(is_buy, supply + amount, supply - amount)
+    price_after = base_price * (new_supply + 1)
+    average_price = np.divide(total, amount, out=np.zeros_like(total), where=amount > 0)
+    slippage = np.divide(price_after - price, price, out=np.zeros_like(total), where=price > 0)
+    valid = (amount > 0) & (is_buy | (amount <= supply))
+    return {
+        "valid": valid,
+        "price": price,
+        "total": total,
+        "average_price": average_price,
+        "slippage": slippage,
+        "price_after": price_after,
+        "market_cap": supply * price,
+        "market_cap_after": new_supply * price_after,
+        "supply_after": new_supply,
+    }
+
+def quote_rows(supply, base_price, amount, is_buy) -> list:
+    # Same as quote_arrays, transposed into one dict per quote for JSON responses
+    quotes = quote_arrays(supply, base_price, amount, is_buy)
+    columns = {name: np.atleast_1d(values).tolist() for name, values in quotes.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
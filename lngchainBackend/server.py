@@ -12,6 +12,7 @@ from typing import List, Dict, Optional
 from docx import Document
 from fastapi.middleware.cors import CORSMiddleware
 from pymongo import MongoClient
+from bonding_curve import quote_rows
 
 # Load environment variables
 load_dotenv()
@@ -72,6 +73,81 @@ def get_launched_token(symbol: str):
         raise HTTPException(status_code=404, detail="Token not found")
     return token
 
+# Bonding-curve quotes (see bonding_curve.py)
+class QuoteRequest(BaseModel):
+    symbol: str
+    side: str = "buy"  # 'buy' or 'sell'
+    amount: float
+
+class BatchQuoteRequest(BaseModel):
+    quotes: List[QuoteRequest]
+
+class Quote(BaseModel):
+    symbol: str
+    side: str
+    amount: float
+    valid: bool
+    error: Optional[str] = None
+    supply: Optional[float] = None
+    base_price: Optional[float] = None
+    price: Optional[float] = None
+    total: Optional[float] = None
+    average_price: Optional[float] = None
+    slippage: Optional[float] = None
+    price_after: Optional[float] = None
+    market_cap: Optional[float] = None
+    market_cap_after: Optional[float] = None
+    supply_after: Optional[float] = None
+
+MAX_BATCH_QUOTES = int(os.getenv("MAX_BATCH_QUOTES", "1000"))
+
+def compute_quotes(requests: List[QuoteRequest]) -> List[Quote]:
+    # One Mongo query for every symbol, then one vectorized pass over all quotes
+    symbols = list({r.symbol for r in requests})
+    curves = {
+        t["symbol"]: t
+        for t in launched_tokens.find({"symbol": {"$in": symbols}}, {"_id": 0, "symbol": 1, "supply": 1, "base_price": 1})
+    }
+    quotable = [r for r in requests if curves.get(r.symbol, {}).get("base_price") is not None and r.side in ("buy", "sell")]
+    rows = quote_rows(
+        [curves[r.symbol].get("supply") or 0 for r in quotable],
+        [curves[r.symbol]["base_price"] for r in quotable],
+        [r.amount for r in quotable],
+        [r.side == "buy" for r in quotable],
+    ) if quotable else []
+    computed = {id(r): row for r, row in zip(quotable, rows)}
+    quotes = []
+    for r in requests:
+        base = {"symbol": r.symbol, "side": r.side, "amount": r.amount}
+        row = computed.get(id(r))
+        if r.side not in ("buy", "sell"):
+            quotes.append(Quote(**base, valid=False, error="side must be 'buy' or 'sell'"))
+        elif r.symbol not in curves:
+            quotes.append(Quote(**base, valid=False, error="Token not found"))
+        elif row is None:
+            quotes.append(Quote(**base, valid=False, error="Token has no base_price"))
+        else:
+            curve = {"supply": curves[r.symbol].get("supply") or 0, "base_price": curves[r.symbol]["base_price"]}
+            if not row["valid"]:
+                error = "amount must be positive" if r.amount <= 0 else "amount exceeds supply"
+                quotes.append(Quote(**base, **curve, valid=False, error=error, price=row["price"], market_cap=row["market_cap"]))
+            else:
+                quotes.append(Quote(**base, **curve, **row))
+    return quotes
+
+@app.get("/api/marketplace/quote", response_model=Quote)
+def get_quote(symbol: str, amount: float, side: str = "buy"):
+    quote = compute_quotes([QuoteRequest(symbol=symbol, side=side, amount=amount)])[0]
+    if quote.error == "Token not found":
+        raise HTTPException(status_code=404, detail="Token not found")
+    return quote
+
+@app.post("/api/marketplace/quote/batch", response_model=List[Quote])
+def get_quotes(req: BatchQuoteRequest):
+    if len(req.quotes) > MAX_BATCH_QUOTES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUOTES} quotes per request")
+    return compute_quotes(req.quotes)
+
 class ChatMessage(BaseModel):
     role: str  # 'user' or 'assistant'
     content: str